@@ -1,16 +1,51 @@
 import sqlite3
-from flask import Flask, render_template, jsonify, g, send_from_directory, request, redirect, url_for
+from flask import Flask, render_template, jsonify, g, send_from_directory, request, redirect, url_for, Response, stream_with_context
 import os
+import collections
+import functools
+import datetime
+import itertools
+import re
+import threading
+import time
 import pandas as pd 
+from case_table import (
+    ATTRIBUTE_COLUMNS, STATEMENT_COLUMN, VERSION_COLUMN, build_case_table, coordinate_to_float,
+    count_split_items, filter_customize_cases, scalar_or_none, table_content_hash, timestamps_to_versions
+)
+from case_fragments import render_case_card, render_customize_card, render_speakers_html
+from pin_layout import PinLayout
+from rate_limit import TokenBucketLimiter
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 # Firebase Imports
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.cloud.firestore_v1.field_path import FieldPath # 日本語のフィールド名をorder_byで使うため（バッククォートで囲んだ形にする）
 import json # サービスアカウントキーの読み込みに必要
 
 # --- Configuration Settings ---
 DATABASE = 'ryojo_customization.db' # SQLite database is no longer used for live app data
 COLLECTION_NAME = 'cases' # Firestoreのコレクション名
+CHANGES_COLLECTION_NAME = 'case_changes' # 整備名グループから事例が外れた（削除・整備名変更）記録を残すコレクション（差分同期用）
+CHANGES_RETENTION_DAYS = int(os.environ.get('CHANGES_RETENTION_DAYS', 30)) # 変更ログを残す日数（古い記録は書き込みのついでに削除する）
+CHANGES_PRUNE_LIMIT = 200 # 1回の書き込みの後に削除する古い変更ログの最大件数
+CHANGES_PRUNED_DOC_ID = '_pruned' # 変更ログをどの時点まで削除したか（pruned_until）を記録するドキュメント
+CASE_TABLE_TTL_SECONDS = int(os.environ.get('CASE_TABLE_TTL_SECONDS', 60)) # 事例テーブルをワーカー内で再利用する秒数
+CASE_FIELDS = ['整備名', '発言者', '発言内容'] + ATTRIBUTE_COLUMNS + ['緯度', '経度', '写真'] # 事例ドキュメントに保存する項目
+BATCH_MAX_ITEMS = 1000 # /api/cases/batch で一度に受け付ける件数の上限
+BATCH_CHUNK_SIZE = 200 # FirestoreのWriteBatch 1回あたりの事例数（変更ログを含めても上限500件に収まるように）
+SSR_ENABLED = os.environ.get('SSR_ENABLED', '1') == '1' # /cases, /customize, /statistics をサーバー側でHTMLまで描画するか（'0'でJavaScriptによる描画に戻す）
+RYOJO_CENTER_LAT = 34.240 # 位置情報のないR事例（地区全体の道路整備）を置く両城地区の中心
+RYOJO_CENTER_LON = 132.550
+CASES_DATA_SOURCE = os.environ.get('CASES_DATA_SOURCE', 'firestore') # 'standin' にすると負荷試験用の合成データ（stand_in_data.py）を使う
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1' # データAPIのクライアントごとのリクエスト数制限
+RATE_LIMIT_PER_MINUTE = float(os.environ.get('RATE_LIMIT_PER_MINUTE', 30)) # クライアントIP・エンドポイントごとの1分あたりの上限（ワーカーごと）
+RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST', 10)) # 連続して受け付けるリクエスト数
+BUILD_CONCURRENCY = int(os.environ.get('BUILD_CONCURRENCY', 2)) # ワーカー内で同時にデータを組み立てるリクエスト数の上限
+BUILD_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('BUILD_QUEUE_TIMEOUT_SECONDS', 2)) # 空きを待つ最大秒数（過ぎたら前回の結果か429を返す）
+LAST_PAYLOADS_MAX_ENTRIES = 16 # 混雑時に返すために保存しておく前回の結果の数（古いものから捨てる）
+PROXY_COUNT = int(os.environ.get('PROXY_COUNT', 1)) # 前段のプロキシの数（Renderでは1）。クライアントIPを X-Forwarded-For から取るために使う
 # ----------------------------
 
 # Unique version string for debugging
@@ -20,6 +55,9 @@ APP_VERSION = "2025-07-26_FINAL_FIX_V8" # バージョンを更新して確認
 db = None 
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
+if PROXY_COUNT > 0:
+    # プロキシ経由でもrequest.remote_addrが実際のクライアントIPになるようにする（レート制限のキー）
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_COUNT)
 
 # Helper function to get a database connection (for local SQLite fallback, if used)
 def get_db():
@@ -40,7 +78,12 @@ def close_connection(exception):
 
 # Initialize Firebase Admin SDK
 try:
-    if not firebase_admin._apps:
+    if CASES_DATA_SOURCE == 'standin':
+        # ★新規追加: 負荷試験（load_test.py）用。Firestoreに接続せず、合成データと擬似的な待ち時間で応答する
+        from stand_in_data import StandInFirestore
+        db = StandInFirestore.from_env()
+        print("Using stand-in data source instead of Firestore (CASES_DATA_SOURCE=standin).")
+    elif not firebase_admin._apps:
         # 環境変数からJSON文字列を読み込む（Renderデプロイ時を想定）
         service_account_json_str = os.environ.get('SERVICE_ACCOUNT_JSON_DATA')
         if service_account_json_str:
@@ -54,8 +97,9 @@ try:
                 raise FileNotFoundError("firebase_service_account.json が見つかりません。環境変数 SERVICE_ACCOUNT_JSON_DATA も未設定です。")
         
         firebase_admin.initialize_app(cred)
-    db = firestore.client() 
-    print("Firebase Admin SDK initialized successfully.")
+    if db is None:
+        db = firestore.client() 
+        print("Firebase Admin SDK initialized successfully.")
 except Exception as e:
     print(f"Error initializing Firebase Admin SDK: {e}")
     print("Firebase Admin SDKの初期化に失敗しました。サービスアカウントキーを確認してください。")
@@ -67,17 +111,311 @@ def get_firestore_db():
         raise RuntimeError("Firestore DB client is not initialized. Check Firebase Admin SDK initialization.")
     return db
 
+# --- 事例テーブルのキャッシュ ---
+# 各エンドポイントが毎回Firestoreを読んでDataFrameを作る代わりに、
+# ワーカーごとに1つのコンパクトな事例テーブル（case_table.py）を共有する
+# 差分同期用に、同じ時点の変更ログ（グループから事例が外れた記録）と、テーブルの内容のハッシュも一緒に保持する
+# full_sync_before: これより前の since からの差分は正しく求められないので全件を返す（バージョン）。
+#   変更ログを削除済みの時点（pruned_until）と、まだ削除されていないが読まなかった保存期間より前の記録があればその期間の始まり、の遅い方
+# generation: invalidate_case_table() を呼んだ回数
+_case_table_cache = {'table': None, 'removals': [], 'content_hash': None, 'full_sync_before': 0, 'loaded_at': 0.0, 'generation': 0}
+_case_table_lock = threading.Lock()
+
+def get_case_table():
+    return get_case_snapshot()[0]
+
+# キャッシュが有効なら (事例テーブル, 変更ログ) を返し、なければNoneを返す（_case_table_lock を持った状態で呼ぶ）
+def _fresh_case_snapshot():
+    table = _case_table_cache['table']
+    if table is not None and time.monotonic() - _case_table_cache['loaded_at'] < CASE_TABLE_TTL_SECONDS:
+        return table, _case_table_cache['removals']
+    return None
+
+# 読み直さずに、キャッシュ済みの (事例テーブル, 変更ログ) を返す（キャッシュがない・期限切れならNone）
+def peek_case_snapshot():
+    with _case_table_lock:
+        return _fresh_case_snapshot()
+
+# (事例テーブル, [(整備名, 変更バージョン), ...]) を返す
+def get_case_snapshot():
+    with _case_table_lock:
+        snapshot = _fresh_case_snapshot()
+        if snapshot is not None:
+            return snapshot
+
+        firestore_db = get_firestore_db()
+        # 変更ログは書き込み完了後に記録されるので、事例より先に読めばテーブルと矛盾しない
+        removals, full_sync_before = read_case_changes(firestore_db)
+
+        docs = firestore_db.collection(COLLECTION_NAME).stream()
+        all_raw_cases = []
+        for doc in docs:
+            doc_data = doc.to_dict()
+            # '事例'カラムをドキュメントIDとして使用し、doc_dataにも含める
+            doc_data['事例'] = doc.id 
+            all_raw_cases.append(doc_data)
+        print(f"DEBUG: Raw cases fetched from DB: {len(all_raw_cases)} items") 
+
+        table = build_case_table(all_raw_cases)
+        _store_case_snapshot(table, removals, full_sync_before)
+        return table, removals
+
+# 変更ログを読み、(removals, full_sync_before) を返す
+# 保存期間（CHANGES_RETENTION_DAYS）内の記録だけを読む（pruned_until のドキュメントは changed_at を持たないので含まれない）
+# 削除は書き込みのついでにしか行わないので、しばらく書き込みがないと保存期間より前の記録が残っている（読まない）ことがある。
+# その場合は、保存期間より前の since からの差分も全件を返す（古い記録が1件でもあるかだけを調べる）
+def read_case_changes(firestore_db):
+    changes_ref = firestore_db.collection(CHANGES_COLLECTION_NAME)
+    retention_cutoff = get_changes_retention_cutoff()
+    pruned_doc = changes_ref.document(CHANGES_PRUNED_DOC_ID).get()
+    pruned_until = pruned_doc.to_dict().get('pruned_until') if pruned_doc.exists else None
+    has_unread_changes = any(True for _ in changes_ref.where(
+        filter=firestore.FieldFilter('changed_at', '<', retention_cutoff)
+    ).limit(1).stream())
+    full_sync_before = int(timestamps_to_versions([pruned_until, retention_cutoff if has_unread_changes else None]).max())
+    changes_query = changes_ref.where(filter=firestore.FieldFilter('changed_at', '>=', retention_cutoff))
+    changes = [change.to_dict() for change in changes_query.stream()]
+    removed_at = timestamps_to_versions([change.get('changed_at') for change in changes])
+    removals = [(change.get('整備名'), int(version)) for change, version in zip(changes, removed_at)]
+    return removals, full_sync_before
+
+# 読み込んだ事例テーブルをキャッシュに入れる（_case_table_lock を持った状態で呼ぶ）
+def _store_case_snapshot(table, removals, full_sync_before):
+    _case_table_cache['table'] = table
+    _case_table_cache['removals'] = removals
+    _case_table_cache['content_hash'] = table_content_hash(table)
+    _case_table_cache['full_sync_before'] = full_sync_before
+    _case_table_cache['loaded_at'] = time.monotonic()
+
+# NDJSONストリーミングで読んだ事例テーブルをキャッシュに入れる
+# 読んでいる間に書き込み（invalidate_case_table）があった場合や、他のリクエストが先に読み直した場合は入れない
+def store_streamed_case_snapshot(table, removals, full_sync_before, generation):
+    with _case_table_lock:
+        if _case_table_cache['generation'] != generation or _fresh_case_snapshot() is not None:
+            return False
+        _store_case_snapshot(table, removals, full_sync_before)
+        return True
+
+# 書き込みで事例テーブルを捨てた回数（ストリーミング中に書き込みがあったかの判定に使う）
+def get_case_table_generation():
+    with _case_table_lock:
+        return _case_table_cache['generation']
+
+# データを書き換えた後に呼び出し、次のリクエストで事例テーブルを読み直させる
+def invalidate_case_table():
+    with _case_table_lock:
+        _case_table_cache['table'] = None
+        _case_table_cache['removals'] = []
+        _case_table_cache['content_hash'] = None
+        _case_table_cache['full_sync_before'] = 0
+        _case_table_cache['loaded_at'] = 0.0
+        _case_table_cache['generation'] += 1
+
+# 事例テーブルと変更ログから、データ全体のバージョン（最後に変更された時刻, UNIX時間のマイクロ秒）を求める
+def get_data_version(df, removals):
+    version = 0
+    if not df.empty:
+        version = max(version, int(df[VERSION_COLUMN].max()))
+    if removals:
+        version = max(version, max(removed_at for _, removed_at in removals))
+    return version
+
+# 事例テーブルの内容のハッシュ。キャッシュ済みの事例テーブルなら読み込み時に計算したものを使う
+def get_content_hash(df):
+    with _case_table_lock:
+        if _case_table_cache['table'] is df:
+            return _case_table_cache['content_hash']
+    return table_content_hash(df)
+
+# 描画済みページ・ピンの表示位置のキャッシュに使うキー: (バージョン, 内容のハッシュ)
+# initialize_db.py やFirebaseコンソールでの削除は変更ログにもバージョンにも残らないので、内容のハッシュでも変更を検出する
+def get_data_key(df, removals):
+    return get_data_version(df, removals), get_content_hash(df)
+
+# これより前の since には全件を返す時点（バージョン）。get_case_snapshot() で事例テーブルと一緒に求めた値
+def get_full_sync_before():
+    with _case_table_lock:
+        return _case_table_cache['full_sync_before']
+
+# 変更ログの保存期間の始まり（これより前の記録は読まず、書き込みのついでに削除する）
+def get_changes_retention_cutoff():
+    return datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=CHANGES_RETENTION_DAYS)
+
+# 保存期間を過ぎた変更ログを最大 CHANGES_PRUNE_LIMIT 件削除し、削除した時点を pruned_until に記録する（事例の書き込みの後に呼び出す）
+# 削除に失敗しても事例の書き込みは成功しているので、エラーは記録するだけにする
+def prune_case_changes(firestore_db):
+    try:
+        cutoff = get_changes_retention_cutoff()
+        changes_ref = firestore_db.collection(CHANGES_COLLECTION_NAME)
+        old_changes = changes_ref.where(filter=firestore.FieldFilter('changed_at', '<', cutoff)).limit(CHANGES_PRUNE_LIMIT).stream()
+        batch = firestore_db.batch()
+        count = 0
+        for change in old_changes:
+            batch.delete(changes_ref.document(change.id))
+            count += 1
+        if count:
+            batch.set(changes_ref.document(CHANGES_PRUNED_DOC_ID), {'pruned_until': cutoff})
+            batch.commit()
+            print(f"DEBUG: Pruned {count} old entries from '{CHANGES_COLLECTION_NAME}' (before {cutoff})")
+    except Exception as e:
+        print(f"ERROR: Failed to prune '{CHANGES_COLLECTION_NAME}': {e}")
+
+# 書き換え前の事例ドキュメントの整備名を取得する（存在しなければNone）
+def get_current_group_name(firestore_db, doc_id):
+    old_doc = firestore_db.collection(COLLECTION_NAME).document(doc_id).get()
+    if not old_doc.exists:
+        return None
+    return old_doc.to_dict().get('整備名')
+
+# 事例が元の整備名グループから外れた（削除・整備名の変更）場合に、変更ログに記録する
+# 追加・更新は date_added / date_updated から分かるが、外れたグループはドキュメントに残らないため
+def record_group_removal(firestore_db, doc_id, old_group_name, new_group_name):
+    if old_group_name is None or old_group_name == new_group_name:
+        return
+    firestore_db.collection(CHANGES_COLLECTION_NAME).add({
+        '整備名': old_group_name, '事例': doc_id, 'changed_at': firestore.SERVER_TIMESTAMP
+    })
+    prune_case_changes(firestore_db)
+
+# --- データAPIとページの流量制御 ---
+# 1. クライアントIPとエンドポイントごとのトークンバケット（rate_limit.py）で、短時間に繰り返すリクエストを429で断る
+# 2. Firestoreの読み込みとpandasでの組み立てを同時に行うリクエストを BUILD_CONCURRENCY 件までに抑える
+#    空きがなければ、同じエンドポイント・同じパラメータで前回返した結果（少し古いかもしれない）を返し、それもなければ429を返す
+#    前回の結果のキーは、エンドポイントと payload_args に挙げた（結果を変える）クエリパラメータだけにする
+#    （それ以外のパラメータを付けてキーを増やせないように。念のため LAST_PAYLOADS_MAX_ENTRIES 件を超えたら古いものから捨てる）
+#    （クライアントごとに結果が変わる差分同期 /api/cases/changes は前回の結果を保存しない: serve_stale=False）
+#    HTMLを返すページ（/cases, /customize, /statistics）は page_key でキャッシュのキーを渡す。描画済みのページ（render_cached_page）が
+#    今のデータのものなら枠を使わずに返し、枠が空かなければ古いデータで描画したページを返す（JSONの前回の結果は使わない）
+#    NDJSONストリーミングは、次の行を組み立てる間だけ枠を持ち、送信中（遅いクライアントを待つ間）は手放す
+rate_limiter = TokenBucketLimiter(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST)
+_build_slots = threading.BoundedSemaphore(BUILD_CONCURRENCY)
+_last_payloads = collections.OrderedDict() # (エンドポイント, パラメータの値) -> 前回返したJSONの本文（最近使った順）
+_last_payloads_lock = threading.Lock()
+
+def get_last_payload(payload_key):
+    with _last_payloads_lock:
+        payload = _last_payloads.get(payload_key)
+        if payload is not None:
+            _last_payloads.move_to_end(payload_key)
+        return payload
+
+def store_last_payload(payload_key, payload):
+    with _last_payloads_lock:
+        _last_payloads[payload_key] = payload
+        _last_payloads.move_to_end(payload_key)
+        while len(_last_payloads) > LAST_PAYLOADS_MAX_ENTRIES:
+            _last_payloads.popitem(last=False)
+
+def too_many_requests(message, retry_after):
+    if request.path.startswith('/api/'):
+        response = jsonify({'success': False, 'message': message})
+    else:
+        response = Response(message, mimetype='text/plain') # ページ（HTML）へのリクエストにはJSONではなく文章だけを返す
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+# ストリーミングの本文を、1チャンク作るたびに枠を取り直して返すジェネレーター
+# 枠を持つのは next() で次のチャンクを作っている間だけなので、クライアントへの送信時間は同時実行数に数えない
+# （途中で空きを待つ場合は、応答を始めた後なので429にはせずに待つ）
+def _build_with_slot_per_chunk(chunks):
+    iterator = iter(chunks)
+    try:
+        while True:
+            _build_slots.acquire()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                _build_slots.release()
+            yield chunk
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            close()
+
+def admission_controlled(endpoint_key, serve_stale=True, payload_args=(), page_key=None):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if RATE_LIMIT_ENABLED:
+                allowed, retry_after = rate_limiter.allow(f"{request.remote_addr}|{endpoint_key}")
+                if not allowed:
+                    print(f"DEBUG: Rate limit exceeded for {request.remote_addr} on {endpoint_key}")
+                    return too_many_requests('リクエストが多すぎます。しばらくしてから再度お試しください。', retry_after)
+
+            # 今のデータで描画済みのページは、枠を使わずにそのまま返す
+            rendered_page_key = page_key() if page_key is not None else None
+            if rendered_page_key is not None:
+                html = get_rendered_page(rendered_page_key)
+                if html is not None:
+                    return html
+
+            payload_key = (endpoint_key,) + tuple(request.args.get(name) for name in payload_args)
+            if not _build_slots.acquire(timeout=BUILD_QUEUE_TIMEOUT_SECONDS):
+                html = get_rendered_page(rendered_page_key, allow_stale=True) if rendered_page_key is not None else None
+                if html is not None:
+                    print(f"DEBUG: Build slots are full. Serving last rendered page for {rendered_page_key}")
+                    response = app.make_response(html)
+                    response.headers['X-Served-From-Cache'] = 'stale'
+                    return response
+                payload = get_last_payload(payload_key) if serve_stale else None
+                if payload is not None:
+                    print(f"DEBUG: Build slots are full. Serving last payload for {payload_key}")
+                    response = Response(payload, mimetype='application/json')
+                    response.headers['X-Served-From-Cache'] = 'stale'
+                    return response
+                print(f"DEBUG: Build slots are full and no payload is cached for {payload_key}")
+                return too_many_requests('サーバーが混み合っています。しばらくしてから再度お試しください。', 1)
+
+            try:
+                response = app.make_response(view(*args, **kwargs))
+                if response.is_streamed:
+                    # NDJSONストリーミングはまだ何も組み立てていない（ジェネレーターを作っただけ）ので、
+                    # 受付時の枠はここで返し、本文は1チャンクごとに枠を取り直して作る
+                    response.response = _build_with_slot_per_chunk(response.response)
+                elif serve_stale and response.status_code == 200 and response.mimetype == 'application/json':
+                    store_last_payload(payload_key, response.get_data())
+                return response
+            finally:
+                _build_slots.release()
+        return wrapper
+    return decorator
+# ----------------------------
+
 # --- Routing Definitions ---
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+# /cases の描画済みページのキー（キャッシュしないカテゴリやSSRを使わない場合はNone）
+def cases_page_key():
+    category_filter = request.args.get('category', 'all')
+    # ナビゲーションにあるカテゴリのみキャッシュする（任意の値でキャッシュが増えないように）
+    if SSR_ENABLED and category_filter in CASE_CATEGORY_FILTERS:
+        return ('cases', category_filter)
+    return None
+
 @app.route('/cases')
+@admission_controlled('cases_page', serve_stale=False, page_key=cases_page_key)
 def cases_page():
     # 'category'クエリパラメータを取得し、デフォルトは'all'
     category_filter = request.args.get('category', 'all')
-    return render_template('cases.html', category_filter=category_filter)
+    if not SSR_ENABLED:
+        return render_template('cases.html', category_filter=category_filter)
+
+    def render(df):
+        cases = build_cases(df)
+        if category_filter != 'all':
+            cases = [case for case in cases if case['category'] == category_filter]
+        return render_template('cases.html', category_filter=category_filter, cases=cases)
+
+    page_key = cases_page_key()
+    if page_key is None:
+        return render(get_case_table())
+    return render_cached_page(page_key, render)
 
 # @app.route('/cases/<category>') # このルーティングはもう使用しない
 # def cases_by_category(category):
@@ -93,45 +431,121 @@ def admin_page():
 
 # 新規追加: 統計ページへのルーティング
 @app.route('/statistics')
+@admission_controlled('statistics_page', serve_stale=False, page_key=lambda: ('statistics',) if SSR_ENABLED else None)
 def statistics_page():
-    return render_template('statistics.html')
+    if not SSR_ENABLED:
+        return render_template('statistics.html')
+
+    def render(df):
+        statistics_data = build_statistics(df)
+        # statistics.js と同じく、件数の多い順に並べる
+        statistics = {
+            col: sorted(sorted(statistics_data.get(col, {}).items()), key=lambda item: -item[1])
+            for col in ['整備', '目的', '発意', '時期']
+        }
+        return render_template('statistics.html', statistics=statistics)
+
+    return render_cached_page(('statistics',), render)
 
 # ★新規追加: カスタマイズページへのルーティング
 @app.route('/customize')
+@admission_controlled('customize_page', serve_stale=False, page_key=lambda: ('customize',) if SSR_ENABLED else None)
 def customize_page():
-    return render_template('customize.html')
-
+    if not SSR_ENABLED:
+        return render_template('customize.html')
+
+    def render(df):
+        historical_summary = build_historical_summary(df)
+        historical_timeline = sorted(historical_summary.items(), key=lambda item: historical_period_sort_key(item[0]))
+        return render_template(
+            'customize.html',
+            historical_timeline=historical_timeline,
+            customize_groups=group_customize_cases(build_customize_cases(df))
+        )
+
+    return render_cached_page(('customize',), render)
+
+# --- サーバーサイドレンダリング (SSR) ---
+# 描画済みのページを、描画したときのデータのキー（バージョンと内容のハッシュ）と一緒にキャッシュし、データが変わったら作り直す
+# 古いデータのページも作り直すまでは残し、データAPIの枠が空かないときに返す（ページの種類は CASE_CATEGORY_FILTERS と合わせて8つまで）
+CASE_CATEGORY_FILTERS = ['all', 'R', 'C', 'K', 'D', 'O']
+_rendered_page_cache = {} # ページのキー -> (データのキー, HTML)
+_rendered_page_lock = threading.Lock()
+
+def render_cached_page(page_key, render):
+    df, removals = get_case_snapshot()
+    data_key = get_data_key(df, removals)
+    with _rendered_page_lock:
+        cached = _rendered_page_cache.get(page_key)
+    if cached is not None and cached[0] == data_key:
+        return cached[1]
+
+    html = render(df)
+    with _rendered_page_lock:
+        _rendered_page_cache[page_key] = (data_key, html)
+    print(f"DEBUG: Rendered page {page_key} for data key {data_key}")
+    return html
+
+# 描画済みのページを返す（なければNone）。事例テーブルは読み直さない
+# allow_stale=False なら、キャッシュ済みの事例テーブルと同じデータで描画したものだけを返す
+def get_rendered_page(page_key, allow_stale=False):
+    snapshot = peek_case_snapshot()
+    with _rendered_page_lock:
+        cached = _rendered_page_cache.get(page_key)
+    if cached is None:
+        return None
+    if allow_stale or (snapshot is not None and cached[0] == get_data_key(*snapshot)):
+        return cached[1]
+    return None
+
+# 年表の時期の並び順（customize.js の並び順と同じ）
+HISTORICAL_PERIOD_ORDER = {
+    '戦前': 0, '昭和初期': 1, '昭和20年代': 2, '昭和30年代': 3, '昭和40年代': 4,
+    '昭和50年代': 5, '昭和52年': 5.1, '昭和60年代': 6, '昭和64年': 6.1, '平成初期': 7,
+    '10～20年前': 10, '10年前': 11, '20年前': 9, '25~30年前': 8, '最近': 12, '1年前': 13, '不明な時期': 99
+}
+
+def historical_period_sort_key(period):
+    if period in HISTORICAL_PERIOD_ORDER:
+        return HISTORICAL_PERIOD_ORDER[period]
+    # 一覧にない時期は先頭の数値で並べ、数値で始まらないものは最後に（JavaScriptの parseFloat(a) || 98 と同じ）
+    match = re.match(r'\s*[+-]?(\d+\.?\d*|\.\d+)', period)
+    return (float(match.group()) if match else 0) or 98
+
+# カスタマイズ事例を「発意 / 所有」ごとにまとめる（customize.js と同じ並び順）
+def group_customize_cases(customize_cases):
+    groups = {}
+    for case in customize_cases:
+        initiative = case.get('initiative_for_card') or '不明'
+        ownership = case.get('ownership_for_card') or '不明'
+        groups.setdefault((initiative, ownership), []).append(case)
+
+    initiative_classes = {'個人': 'initiative-individual', '自治会': 'initiative-jichikai'}
+    return [
+        {'initiative': initiative, 'ownership': ownership, 'initiative_class': initiative_classes.get(initiative, ''), 'cases': cases}
+        for (initiative, ownership), cases in groups.items()
+    ]
 
 # ★新規追加: カスタマイズページ用のAPIエンドポイント
 @app.route('/api/customize_cases')
+@admission_controlled('customize_cases')
 def get_customize_cases_api():
     print("--- DEBUG START: get_customize_cases_api function entered ---")
-    firestore_db = get_firestore_db()
-    
-    docs = firestore_db.collection(COLLECTION_NAME).stream()
-    all_raw_cases = []
-    for doc in docs:
-        doc_data = doc.to_dict()
-        doc_data['事例'] = doc.id 
-        all_raw_cases.append(doc_data)
+    return jsonify(build_customize_cases(get_case_table()))
 
-    if not all_raw_cases:
+# カスタマイズ事例の一覧を作成する関数（APIとサーバーサイドレンダリングの両方から使う）
+def build_customize_cases(df):
+    if df.empty:
         print("DEBUG: No raw cases found for customize cases.")
-        return jsonify([])
-
-    df = pd.DataFrame(all_raw_cases)
+        return []
 
     # '発意'が「個人」または「自治会」の事例のみをフィルタリング
     # Excelのセルに複数の発意がカンマ区切りで入っている可能性も考慮
-    filtered_df = df[
-        df['発意'].apply(lambda x: isinstance(x, str) and ('個人' in x or '自治会' in x))
-    ].copy() 
+    filtered_df = filter_customize_cases(df)
 
     print(f"DEBUG: Filtered customize cases: {len(filtered_df)} items")
 
     grouped_cases = []
-    RYOJO_CENTER_LAT = 34.240  
-    RYOJO_CENTER_LON = 132.550 
 
     # '整備名'でグループ化
     group_by_column = '整備名' 
@@ -140,7 +554,7 @@ def get_customize_cases_api():
         group_by_column = '事例' 
 
     try:
-        grouped_df = filtered_df.groupby(group_by_column)
+        grouped_df = filtered_df.groupby(group_by_column, observed=True)
         print(f"DEBUG: GroupBy successful for customize cases. Number of groups: {len(grouped_df.groups.keys())}") 
     except Exception as e:
         print(f"ERROR: GroupBy failed on column '{group_by_column}' for customize cases: {e}") 
@@ -150,62 +564,20 @@ def get_customize_cases_api():
         is_area_wide_case = False 
         description_html = "" 
 
-        map_representative_row = group.dropna(subset=['緯度', '経度']).iloc[0] if not group.dropna(subset=['緯度', '経度']).empty else None
+        rows_with_coords = group.dropna(subset=['緯度', '経度'])
+        map_representative_row = rows_with_coords.iloc[0] if not rows_with_coords.empty else None
         
         card_title = str(group_key).strip()
 
-        subtitle_content = group['発言内容'].iloc[0] if not group['発言内容'].isnull().all() else '代表的な発言内容なし'
+        subtitle_content = scalar_or_none(group[STATEMENT_COLUMN].iloc[0]) if not group[STATEMENT_COLUMN].isnull().all() else '代表的な発言内容なし'
         display_representative_row = group.iloc[0] 
 
         category_map = {
             'R': '道路整備', 'C': '自治会', 'K': 'キーパーソン', 'D': '災害', 'O': 'その他'
         }
 
-        # 概要情報 (summary_attributes_html_final)
-        summary_parts = []
-        for col in ['整備', '目的', '発意', '実行', '費用', '契機', '時期', '所有', '管理', '利用']: 
-            unique_values = group[col].dropna().unique().tolist()
-            if unique_values:
-                summary_parts.append(f"<strong>{col}:</strong> {', '.join(map(str, unique_values))}") 
-        
-        summary_attributes_html_final = "" 
-        if summary_parts:
-            summary_attributes_html_final = "".join([f"<p>{part}</p>" for part in summary_parts]) 
-        else:
-            summary_attributes_html_final = "<p>概要情報がありません。</p>"
-
-        # ヒアリング内容 (statements_html_final) - 各発言に詳細要素を紐付け、整備ごとにグループ化
-        statements_html_final = ""
-        statements_by_seibi_type = {} 
-        for _, r in group.iterrows(): 
-            statement_content = r.get('発言内容', '')
-            seibi_type_for_statement = str(r.get('整備', 'その他整備')).strip() 
-            
-            if statement_content and statement_content != '不明':
-                details_for_this_statement = []
-                for col in ['発言者', '目的', '発意', '時期']: 
-                    val = r.get(col)
-                    if val and str(val).strip() != '不明':
-                        details_for_this_statement.append(f"{col}: {str(val).strip()}")
-                
-                formatted_individual_statement = f"<p><strong>・{statement_content}</strong>"
-                if details_for_this_statement:
-                    formatted_individual_statement += f"<br>({', '.join(details_for_this_statement)})</p>"
-                else:
-                    formatted_individual_statement += "</p>"
-                
-                if seibi_type_for_statement not in statements_by_seibi_type:
-                    statements_by_seibi_type[seibi_type_for_statement] = []
-                statements_by_seibi_type[seibi_type_for_statement].append(formatted_individual_statement)
-
-        if statements_by_seibi_type:
-            for seibi_type, statements_list in statements_by_seibi_type.items():
-                statements_html_final += f"<h5>{seibi_type}:</h5>" 
-                statements_html_final += "<div>" + "".join(statements_list) + "</div>"
-        else:
-            statements_html_final = "<p>発言内容がありません。</p>"
-
-        description_for_mapbox = summary_attributes_html_final + "<h4>ヒアリング内容:</h4>" + statements_html_final
+        # 概要情報と、整備ごとにまとめたヒアリング内容（発言1行分のHTMLは case_fragments.py でキャッシュ）
+        summary_attributes_html_final, statements_html_final, description_for_mapbox = render_customize_card(group)
 
         print(f"DEBUG (API): Case '{group_key}' - Final summary_attributes_html: '{summary_attributes_html_final}'")
         print(f"DEBUG (API): Case '{group_key}' - Final statements_html: '{statements_html_final}'")
@@ -216,9 +588,9 @@ def get_customize_cases_api():
         img_url = None
 
         if map_representative_row is not None:
-            lat = map_representative_row['緯度']
-            lon = map_representative_row['経度']
-            img_url = map_representative_row.get('写真', None)
+            lat = coordinate_to_float(map_representative_row['緯度'])
+            lon = coordinate_to_float(map_representative_row['経度'])
+            img_url = scalar_or_none(map_representative_row.get('写真'))
         else:
             if group_key and str(group_key).startswith('R'): 
                 lat = RYOJO_CENTER_LAT
@@ -232,9 +604,8 @@ def get_customize_cases_api():
         first_char_of_id = str(original_case_id_for_category)[0] if original_case_id_for_category else '不明'
         japanese_category = category_map.get(first_char_of_id, 'その他')
 
-        # 発言者リストを生成
-        unique_speakers = group['発言者'].dropna().unique().tolist()
-        speakers_list_html = ', '.join(map(str, unique_speakers)) if unique_speakers else '不明'
+        # 発言者リストを生成（エスケープ済みのHTML。customize.js / cases_summary.js がそのままinnerHTMLに入れる）
+        speakers_list_html = render_speakers_html(group)
 
 
         grouped_cases.append({
@@ -257,118 +628,68 @@ def get_customize_cases_api():
         })
     
     print(f"DEBUG (API): Finished processing all groups. Total grouped cases: {len(grouped_cases)}") 
-    print("--- DEBUG END: get_cases_api function exited ---") 
-    return jsonify(grouped_cases)
+    return grouped_cases
 
 # API endpoint to return statistics data
 @app.route('/api/statistics')
+@admission_controlled('statistics')
 def get_statistics_api():
     print("--- DEBUG START: get_statistics_api function entered ---")
-    firestore_db = get_firestore_db()
-    
-    docs = firestore_db.collection(COLLECTION_NAME).stream()
-    all_raw_cases = []
-    for doc in docs:
-        doc_data = doc.to_dict()
-        doc_data['事例'] = doc.id 
-        all_raw_cases.append(doc_data)
+    return jsonify(build_statistics(get_case_table()))
 
-    if not all_raw_cases:
+# 統計データを作成する関数（APIとサーバーサイドレンダリングの両方から使う）
+def build_statistics(df):
+    if df.empty:
         print("DEBUG: No raw cases found for statistics.")
-        return jsonify({})
+        return {}
 
-    df = pd.DataFrame(all_raw_cases)
-        # ★修正: '発意'が「個人」または「自治会」の事例のみをフィルタリング
-    filtered_df = df[
-        df['発意'].apply(lambda x: isinstance(x, str) and ('個人' in x or '自治会' in x))
-    ].copy()
+    # ★修正: '発意'が「個人」または「自治会」の事例のみをフィルタリング
+    filtered_df = filter_customize_cases(df)
 
     if filtered_df.empty:
         print("DEBUG: No customize cases found for statistics after filtering.")
-        return jsonify({})
+        return {}
 
     statistics_data = {}
 
-    # 各カテゴリの集計
-    # '整備' (Maintenance Type)
-    seibi_counts = {}
-    for item_list in df['整備'].dropna():
-        for item in str(item_list).split(','): 
-            item = item.strip()
-            if item and item != '不明':
-                seibi_counts[item] = seibi_counts.get(item, 0) + 1
-    statistics_data['整備'] = seibi_counts
-
-    # '目的' (Purpose)
-    purpose_counts = {}
-    for item_list in df['目的'].dropna():
-        for item in str(item_list).split(','):
-            item = item.strip()
-            if item and item != '不明':
-                purpose_counts[item] = purpose_counts.get(item, 0) + 1
-    statistics_data['目的'] = purpose_counts
-
-    # '発意' (Initiative)
-    initiative_counts = {}
-    for item_list in df['発意'].dropna():
-        for item in str(item_list).split(','):
-            item = item.strip()
-            if item and item != '不明':
-                initiative_counts[item] = initiative_counts.get(item, 0) + 1
-    statistics_data['発意'] = initiative_counts
-
-    # '時期' (Period)
-    period_counts = {}
-    for item_list in df['時期'].dropna():
-        for item in str(item_list).split(','):
-            item = item.strip()
-            if item and item != '不明':
-                period_counts[item] = period_counts.get(item, 0) + 1
-    statistics_data['時期'] = period_counts
+    # 各カテゴリの集計（カンマ区切りの項目を個別に数える）
+    # '整備' (Maintenance Type), '目的' (Purpose), '発意' (Initiative), '時期' (Period)
+    for col in ['整備', '目的', '発意', '時期']:
+        statistics_data[col] = count_split_items(df[col])
 
     # Other categories can be added similarly (e.g., '実行', '費用', '所有', '管理', '利用')
     
     print(f"DEBUG: Statistics data generated: {statistics_data}")
-    return jsonify(statistics_data)
+    return statistics_data
 
 # ★新規追加: 歴史年表データを提供するAPIエンドポイント
 @app.route('/api/historical_summary')
+@admission_controlled('historical_summary')
 def get_historical_summary_api():
     print("--- DEBUG START: get_historical_summary_api function entered ---")
-    firestore_db = get_firestore_db()
-    
-    docs = firestore_db.collection(COLLECTION_NAME).stream()
-    all_raw_cases = []
-    for doc in docs:
-        doc_data = doc.to_dict()
-        doc_data['事例'] = doc.id 
-        all_raw_cases.append(doc_data)
+    return jsonify(build_historical_summary(get_case_table()))
 
-    if not all_raw_cases:
+# 歴史年表データ（時期ごとの整備の一覧）を作成する関数（APIとサーバーサイドレンダリングの両方から使う）
+def build_historical_summary(df):
+    if df.empty:
         print("DEBUG: No raw cases found for historical summary.")
-        return jsonify({})
+        return {}
 
-    df = pd.DataFrame(all_raw_cases)
-
-    # '時期'でグループ化し、各時期のユニークな'整備'を収集
+    # '時期'ごとに、その時期のユニークな'整備'を収集
     # NaNを考慮し、時期がない場合は'不明な時期'にまとめる
-    df['時期_clean'] = df['時期'].apply(lambda x: str(x).strip() if pd.notnull(x) and str(x).strip() != '不明' else '不明な時期')
-    df['整備_clean'] = df['整備'].apply(lambda x: str(x).strip() if pd.notnull(x) and str(x).strip() != '不明' else '不明な整備')
-
-    # 時期ごとに整備をまとめる
-    historical_summary = {}
-    for period, group in df.groupby('時期_clean'):
-        unique_seibi_in_period = group['整備_clean'].dropna().unique().tolist()
+    # 行ごとではなく、(時期, 整備) のユニークな組み合わせごとに一度だけ文字列処理を行う
+    historical_sets = {}
+    for period, seibi in df[['時期', '整備']].drop_duplicates().itertuples(index=False):
+        period_clean = str(period).strip() if pd.notnull(period) and str(period).strip() != '不明' else '不明な時期'
+        if pd.isnull(seibi) or str(seibi).strip() == '不明':
+            continue
         # カンマ区切りの整備を個別に展開してユニークにする
-        expanded_seibi = set()
-        for seibi_item in unique_seibi_in_period:
-            for s in seibi_item.split(','):
-                s_clean = s.strip()
-                if s_clean and s_clean != '不明な整備':
-                    expanded_seibi.add(s_clean)
-        
-        if expanded_seibi:
-            historical_summary[period] = sorted(list(expanded_seibi))
+        for s_item in str(seibi).strip().split(','):
+            s_clean = s_item.strip()
+            if s_clean and s_clean != '不明な整備':
+                historical_sets.setdefault(period_clean, set()).add(s_clean)
+
+    historical_summary = {period: sorted(list(expanded_seibi)) for period, expanded_seibi in historical_sets.items()}
     
     # 時系列順にソート (簡易的なソート、より複雑な時期表現にはカスタムソートが必要)
     # 例: '戦前', '昭和20年代', '昭和40年代', '昭和52年', '昭和64年', '10年前', '20年前', '25~30年前', '最近', '不明な時期'
@@ -376,171 +697,233 @@ def get_historical_summary_api():
     sorted_historical_summary = dict(sorted(historical_summary.items()))
 
     print(f"DEBUG: Historical summary data generated: {sorted_historical_summary}")
-    return jsonify(sorted_historical_summary)
-
+    return sorted_historical_summary
+
+
+# 整備名グループのピンの位置・写真を返す関数: (緯度, 経度, 写真, 地区全体の事例か)
+# 位置情報のあるグループは最初に位置情報がある行、ないR事例は両城地区の中心に置く
+def case_map_location(case_id, group):
+    rows_with_coords = group.dropna(subset=['緯度', '経度'])
+    if not rows_with_coords.empty:
+        row = rows_with_coords.iloc[0]
+        return coordinate_to_float(row['緯度']), coordinate_to_float(row['経度']), scalar_or_none(row.get('写真')), False
+    if case_id and str(case_id).startswith('R'):
+        return RYOJO_CENTER_LAT, RYOJO_CENTER_LON, None, True
+    return None, None, None, False
+
+# ★新規追加: 重なるピンの表示位置を整備名順に計算する関数（pin_layout.py）
+# 表示位置がずれたグループだけを {整備名: (緯度, 経度)} で返す
+# NDJSONストリーミング（Firestoreを整備名順に読む）でも同じ順番で PinLayout に渡すので、同じ結果になる
+def compute_display_positions(df):
+    layout = PinLayout()
+    positions = {}
+    for case_id, group in df.groupby('整備名', observed=True):
+        lat, lon, _, _ = case_map_location(case_id, group)
+        display_position = layout.place(lat, lon)
+        if display_position != (lat, lon):
+            positions[case_id] = display_position
+    return positions
+
+# 表示位置はデータのキー（バージョンと内容のハッシュ）ごとに1回だけ計算する
+_display_positions_cache = {'key': None, 'positions': {}}
+_display_positions_lock = threading.Lock()
+
+def get_display_positions(df, removals):
+    data_key = get_data_key(df, removals)
+    with _display_positions_lock:
+        if _display_positions_cache['key'] == data_key:
+            return _display_positions_cache['positions']
+    positions = compute_display_positions(df)
+    with _display_positions_lock:
+        _display_positions_cache['key'] = data_key
+        _display_positions_cache['positions'] = positions
+    print(f"DEBUG: Computed display positions for data key {data_key}: {len(positions)} pins moved")
+    return positions
+
+# 整備名ごとにまとめた事例1件分（地図・一覧用）のデータを作成する関数
+# /api/cases の通常のJSON配列とNDJSONストリーミングの両方から使う
+def build_case_entry(case_id, group, display_positions=None):
+    print(f"DEBUG: Processing case_id: '{case_id}'") 
+
+    # '整備名'カラムが存在すればそれを使用、なければ '事例 {case_id}' を使用
+    case_name_from_excel = group['整備名'].iloc[0] if '整備名' in group.columns and not group['整備名'].iloc[0] is None else f"事例 {case_id}"
+    display_representative_row = group.iloc[0]
+
+    # Debug: Check representative row content
+    print(f"DEBUG: display_representative_row for '{case_id}': {display_representative_row.get('発言内容', 'N/A')}") 
+
+    category_map = {
+        'R': '道路整備', 'C': '自治会', 'K': 'キーパーソン', 'D': '災害', 'O': 'その他'
+    }
+
+    # 概要情報とヒアリング内容（発言1行分のHTMLは case_fragments.py でキャッシュ）
+    summary_attributes_html_final, statements_only_html_final, description_html = render_case_card(group)
+
+    # Debug: Print the generated HTML content
+    print(f"DEBUG (API): Case '{case_id}' - Final summary_attributes_html: '{summary_attributes_html_final}'")
+    print(f"DEBUG (API): Case '{case_id}' - Final statements_only_html: '{statements_only_html_final}'")
+
+
+    lat, lon, img_url, is_area_wide_case = case_map_location(case_id, group)
+    if is_area_wide_case:
+        print(f"DEBUG: Assigning default center to R-case {case_id} as no specific lat/lon found.")
+    elif lat is None:
+        print(f"DEBUG: Case {case_id} (non-R or no ID) has no specific lat/lon. No pin will be placed.")
+
+    # 重なるピンをずらした表示位置（display_positions にないグループは本来の位置のまま）
+    display_lat, display_lon = (display_positions or {}).get(case_id, (lat, lon))
+
+    first_char_of_id = case_id[0] if case_id else '不明'
+    japanese_category = category_map.get(first_char_of_id, 'その他')
+
+    return {
+        'id': case_id, 
+        'name': case_name_from_excel, # ★修正: '整備名'カラムの値を使用
+        'subtitle': scalar_or_none(display_representative_row.get(STATEMENT_COLUMN)), 
+        'description': description_html, 
+        'latitude': lat, # 本来の位置
+        'longitude': lon, 
+        'display_latitude': display_lat, # 地図上にピンを置く位置
+        'display_longitude': display_lon, 
+        'image_url': img_url, 
+        'category': first_char_of_id, 
+        'display_category_jp': japanese_category, 
+        'is_area_wide': is_area_wide_case,
+        'summary_attributes_html': summary_attributes_html_final, # 概要情報のみ
+        'statements_html': statements_only_html_final # 構造化された発言内容のみ
+    }
 
 # API endpoint to return customization cases (includes grouping logic)
+# ?format=ndjson を付けると、整備名ごとのグループが完成するたびに1行ずつ返す（NDJSON）
+# 最後の行は {"sync_version": バージョン}（地図ページが差分同期の保存データを作るために使う。/api/cases/changes の since に渡す値）
 @app.route('/api/cases')
+@admission_controlled('cases', payload_args=('format',))
 def get_cases_api():
     print(f"--- DEBUG START: get_cases_api function entered (Version: {APP_VERSION}) ---") 
-    
-    firestore_db = get_firestore_db() 
-    
-    docs = firestore_db.collection(COLLECTION_NAME).stream()
-    all_raw_cases = []
-    for doc in docs:
-        doc_data = doc.to_dict()
-        # '事例'カラムをドキュメントIDとして使用し、doc_dataにも含める
-        doc_data['事例'] = doc.id 
-        all_raw_cases.append(doc_data)
-
-    print(f"DEBUG: Raw cases fetched from DB: {len(all_raw_cases)} items") 
-    if not all_raw_cases:
+
+    if request.args.get('format') == 'ndjson':
+        return Response(stream_with_context(generate_cases_ndjson()), mimetype='application/x-ndjson')
+
+    df, removals = get_case_snapshot()
+    grouped_cases = build_cases(df, get_display_positions(df, removals))
+    print("--- DEBUG END: get_cases_api function exited ---") 
+    return jsonify(grouped_cases)
+
+# 整備名ごとにまとめた事例の一覧を作成する関数（APIとサーバーサイドレンダリングの両方から使う）
+def build_cases(df, display_positions=None):
+    if df.empty:
         print("DEBUG: No raw cases found in DB. Returning empty list.") 
-        return jsonify([])
+        return []
 
-    df = pd.DataFrame(all_raw_cases)
-    
-    df['緯度'] = pd.to_numeric(df['緯度'], errors='coerce')
-    df['経度'] = pd.to_numeric(df['経度'], errors='coerce')
-    
     grouped_cases = []
-    
-    RYOJO_CENTER_LAT = 34.240  
-    RYOJO_CENTER_LON = 132.550 
 
     try:
-        # '事例' (Case ID) でグループ化
-        grouped_df = df.groupby('整備名')
+        # '整備名' でグループ化
+        grouped_df = df.groupby('整備名', observed=True)
         print(f"DEBUG: GroupBy successful. Number of groups: {len(grouped_df.groups.keys())}") 
     except Exception as e:
         print(f"ERROR: GroupBy failed: {e}") 
         raise 
 
     for case_id, group in grouped_df: 
-        print(f"DEBUG: Processing case_id: '{case_id}'") 
-        
-        is_area_wide_case = False 
-        description_html = "" 
-
-        map_representative_row = group.dropna(subset=['緯度', '経度']).iloc[0] if not group.dropna(subset=['緯度', '経度']).empty else None
-        
-        # '整備名'カラムが存在すればそれを使用、なければ '事例 {case_id}' を使用
-        case_name_from_excel = group['整備名'].iloc[0] if '整備名' in group.columns and not group['整備名'].iloc[0] is None else f"事例 {case_id}"
-        display_representative_row = group.iloc[0]
-
-        # Debug: Check representative row content
-        print(f"DEBUG: display_representative_row for '{case_id}': {display_representative_row.get('発言内容', 'N/A')}") 
-
-        category_map = {
-            'R': '道路整備', 'C': '自治会', 'K': 'キーパーソン', 'D': '災害', 'O': 'その他'
-        }
-
-        unique_seibi_types = group['整備'].dropna().unique().tolist() 
-        unique_purposes = group['目的'].dropna().unique().tolist()
-        unique_initiatives = group['発意'].dropna().unique().tolist()
-        unique_executions = group['実行'].dropna().unique().tolist()
-        unique_costs = group['費用'].dropna().unique().tolist()
-        unique_triggers = group['契機'].dropna().unique().tolist()
-        unique_periods = group['時期'].dropna().unique().tolist()
-        unique_ownerships = group['所有'].dropna().unique().tolist()
-        unique_managements = group['管理'].dropna().unique().tolist()
-        unique_usages = group['利用'].dropna().unique().tolist()
-
-        summary_parts = []
-        if unique_seibi_types: summary_parts.append(f"<strong>整備:</strong> {', '.join(unique_seibi_types)}") 
-        if unique_purposes: summary_parts.append(f"<strong>目的:</strong> {', '.join(unique_purposes)}")
-        if unique_initiatives: summary_parts.append(f"<strong>発意:</strong> {', '.join(unique_initiatives)}")
-        if unique_executions: summary_parts.append(f"<strong>実行:</strong> {', '.join(unique_executions)}")
-        if unique_costs: summary_parts.append(f"<strong>費用:</strong> {', '.join(unique_costs)}")
-        if unique_triggers: summary_parts.append(f"<strong>契機:</strong> {', '.join(unique_triggers)}")
-        if unique_periods: summary_parts.append(f"<strong>時期:</strong> {', '.join(unique_periods)}")
-        if unique_ownerships: summary_parts.append(f"<strong>所有:</strong> {', '.join(unique_ownerships)}")
-        if unique_managements: summary_parts.append(f"<strong>管理:</strong> {', '.join(unique_managements)}")
-        if unique_usages: summary_parts.append(f"<strong>利用:</strong> {', '.join(unique_usages)}")
-
-        summary_attributes_html_final = "" 
-        if summary_parts:
-            summary_attributes_html_final = "".join([f"<p>{part}</p>" for part in summary_parts]) 
-        else:
-            summary_attributes_html_final = "<p>概要情報がありません。</p>"
-
-        all_statements_html = []
-        for _, r in group.iterrows():
-            statement_content = r.get('発言内容', '')
-            seibi_type_for_statement = str(r.get('整備', 'その他整備')).strip() 
-            
-            if statement_content and statement_content != '不明':
-                statement_details = []
-                if seibi_type_for_statement and seibi_type_for_statement != 'その他整備': statement_details.append(f"整備: {seibi_type_for_statement}")
-                if r.get('発言者') and r.get('発言者') != '不明': statement_details.append(f"発言者: {r.get('発言者')}")
-                if r.get('目的') and r.get('目的') != '不明': statement_details.append(f"目的: {r.get('目的')}")
-                if r.get('発意') and r.get('発意') != '不明': statement_details.append(f"発意: {r.get('発意')}")
-                if r.get('時期') and r.get('時期') != '不明': statement_details.append(f"時期: {r.get('時期')}")
-                
-                formatted_individual_statement = f"<p><strong>・{statement_content}</strong>"
-                if statement_details:
-                    formatted_individual_statement += f"<br>({', '.join(statement_details)})</p>"
-                else:
-                    formatted_individual_statement += "</p>"
-                
-                all_statements_html.append(formatted_individual_statement)
-
-        statements_only_html_final = ""
-        if all_statements_html:
-            statements_only_html_final = "".join(all_statements_html) 
-        else:
-            statements_only_html_final = "<p>発言内容がありません。</p>"
-
-        description_html += "<h4>ヒアリング内容:</h4>"
-        if all_statements_html:
-            description_html += "<div>" + "".join(all_statements_html) + "</div>"
-        else:
-            description_html += "<p>発言内容がありません。</p>"
-
-        # Debug: Print the generated HTML content
-        print(f"DEBUG (API): Case '{case_id}' - Final summary_attributes_html: '{summary_attributes_html_final}'")
-        print(f"DEBUG (API): Case '{case_id}' - Final statements_only_html: '{statements_only_html_final}'")
-
-
-        lat = None
-        lon = None
-        img_url = None
-
-        if map_representative_row is not None:
-            lat = map_representative_row['緯度']
-            lon = map_representative_row['経度']
-            img_url = map_representative_row.get('写真', None)
-        else:
-            if case_id and case_id.startswith('R'):
-                lat = RYOJO_CENTER_LAT
-                lon = RYOJO_CENTER_LON
-                is_area_wide_case = True 
-                print(f"DEBUG: Assigning default center to R-case {case_id} as no specific lat/lon found.")
-            else:
-                print(f"DEBUG: Case {case_id} (non-R or no ID) has no specific lat/lon. No pin will be placed.")
-
-        first_char_of_id = case_id[0] if case_id else '不明'
-        japanese_category = category_map.get(first_char_of_id, 'その他')
-
-        grouped_cases.append({
-            'id': case_id, 
-            'name': case_name_from_excel, # ★修正: '整備名'カラムの値を使用
-            'subtitle': display_representative_row.get('発言内容', '代表的な発言内容なし'), 
-            'description': description_html, 
-            'latitude': lat, 
-            'longitude': lon, 
-            'image_url': img_url, 
-            'category': first_char_of_id, 
-            'display_category_jp': japanese_category, 
-            'is_area_wide': is_area_wide_case,
-            'summary_attributes_html': summary_attributes_html_final, # 概要情報のみ
-            'statements_html': statements_only_html_final # 構造化された発言内容のみ
-        })
+        grouped_cases.append(build_case_entry(case_id, group, display_positions))
     
     print(f"DEBUG (API): Finished processing all groups. Total grouped cases: {len(grouped_cases)}") 
-    print("--- DEBUG END: get_cases_api function exited ---") 
-    return jsonify(grouped_cases)
+    return grouped_cases
+
+# /api/cases?format=ndjson 用: 整備名ごとのグループを完成した順に1行のJSONとして返すジェネレーター
+def generate_cases_ndjson():
+    snapshot = peek_case_snapshot() # テーブルと変更ログは同じ時点のものをまとめて取る
+    if snapshot is not None:
+        # キャッシュ済みの事例テーブルがあれば、それをグループ順に返す
+        table, removals = snapshot
+        display_positions = get_display_positions(table, removals)
+        for case_id, group in table.groupby('整備名', observed=True):
+            yield json.dumps(build_case_entry(case_id, group, display_positions), ensure_ascii=False) + '\n'
+        yield json.dumps({'sync_version': get_data_version(table, removals)}) + '\n'
+        return
+
+    # キャッシュがない場合は、'整備名'順に並べたドキュメントを読みながら、
+    # 整備名が変わった時点で直前のグループを返す（最初の事例をすぐに表示できるように）
+    # ※ '整備名'フィールドがないドキュメントはFirestoreのorder_byで除外される（通常のグループ化と同じ）
+    # ※ Firestoreのフィールドパスは英数字以外をそのまま受け付けないので、FieldPathで `整備名` の形にして渡す
+    #    （doc.get() も同じ制約があるので、グループ化には to_dict() の値を使う）
+    # 重なるピンの表示位置も、届いた順（整備名順）に PinLayout で決める
+    # 読み終えたら、読んだ事例から事例テーブルのキャッシュも作る（TTLが切れるたびに、地図ページを開くたびに全件を読み直さないように）
+    # ※ '整備名'フィールド自体がないドキュメント（このアプリと initialize_db.py は必ず書き込むので、コンソールで作った場合のみ）は
+    #    このテーブルに入らないので、統計などにはそのキャッシュの間（CASE_TABLE_TTL_SECONDS）だけ数えられない
+    firestore_db = get_firestore_db()
+    generation = get_case_table_generation()
+    removals, full_sync_before = read_case_changes(firestore_db) # get_case_snapshot() と同じく事例より先に読む
+    docs = firestore_db.collection(COLLECTION_NAME).order_by(FieldPath('整備名').to_api_repr()).stream()
+    layout = PinLayout()
+    count = 0
+    all_raw_cases = []
+    for case_id, group_docs in itertools.groupby(docs, key=lambda doc: doc.to_dict().get('整備名')):
+        group_raw_cases = []
+        for doc in group_docs:
+            doc_data = doc.to_dict()
+            doc_data['事例'] = doc.id 
+            group_raw_cases.append(doc_data)
+        all_raw_cases.extend(group_raw_cases)
+        if case_id is None:
+            continue
+        group = build_case_table(group_raw_cases)
+        entry = build_case_entry(case_id, group)
+        entry['display_latitude'], entry['display_longitude'] = layout.place(entry['latitude'], entry['longitude'])
+        count += 1
+        yield json.dumps(entry, ensure_ascii=False) + '\n'
+
+    table = build_case_table(all_raw_cases)
+    version = get_data_version(table, removals)
+    stored = store_streamed_case_snapshot(table, removals, full_sync_before, generation)
+    yield json.dumps({'sync_version': version}) + '\n'
+    print(f"DEBUG (API): Finished streaming grouped cases. Total grouped cases: {count} (version {version}, cached: {stored})")
+
+# ★新規追加: 差分同期用のAPIエンドポイント
+# クライアントが前回受け取ったバージョン (since) 以降に変更された整備名グループだけを返す
+#   upserted: 追加・更新されたグループ（/api/cases と同じ形式）
+#   deleted:  事例がなくなったグループの整備名
+#   display_positions: 重なるピンをずらした表示位置 {整備名: [緯度, 経度]}（ここにないグループは本来の位置に表示）
+#                      他のグループの追加・削除で変わることがあるので、毎回全件を返してクライアント側で保存済みの事例にも反映する
+#   group_ids: 現在あるすべての整備名（差分の場合のみ）。initialize_db.py やFirebaseコンソールでの削除は変更ログに残らないので、
+#              クライアントはここにない事例を保存済みのデータから取り除く
+# since が0または未指定、または変更ログが揃っていない時点（full_sync_before: 削除済み・保存期間より前の記録）より前の場合は全件を返す (full: true)
+@app.route('/api/cases/changes')
+@admission_controlled('case_changes', serve_stale=False)
+def get_case_changes_api():
+    since = request.args.get('since', default=0, type=int)
+    df, removals = get_case_snapshot()
+    version = max(since, get_data_version(df, removals))
+    display_positions = get_display_positions(df, removals)
+    full = since <= 0 or since < get_full_sync_before()
+
+    upserted = []
+    deleted = []
+    group_ids = None
+    if full:
+        for case_id, group in df.groupby('整備名', observed=True):
+            upserted.append(build_case_entry(case_id, group, display_positions))
+    else:
+        group_versions = df.groupby('整備名', observed=True)[VERSION_COLUMN].max()
+        changed_groups = set(group_versions[group_versions > since].index)
+        changed_groups.update(group_name for group_name, removed_at in removals if removed_at > since)
+
+        changed_df = df[df['整備名'].isin(changed_groups)]
+        for case_id, group in changed_df.groupby('整備名', observed=True):
+            upserted.append(build_case_entry(case_id, group, display_positions))
+            changed_groups.discard(case_id)
+        deleted = sorted(changed_groups, key=str)
+        group_ids = df['整備名'].dropna().unique().tolist()
+
+    print(f"DEBUG (API): Case changes since {since}: {len(upserted)} upserted, {len(deleted)} deleted (version {version}, full: {full})")
+    response = {'version': version, 'full': full, 'upserted': upserted, 'deleted': deleted,
+                'display_positions': display_positions}
+    if group_ids is not None:
+        response['group_ids'] = group_ids
+    return jsonify(response)
+
+
 
 @app.route('/api/cases/add', methods=['POST'])
 def add_case():
@@ -573,6 +956,7 @@ def add_case():
             if 'firebase_admin' in globals() and firebase_admin._apps:
                 firestore_db = get_firestore_db()
                 doc_id = str(事例)
+                old_group_name = get_current_group_name(firestore_db, doc_id)
                 doc_data = {
                     '整備名': 整備名, # 事例名を追加
                     '発言者': 発言者, '発言内容': 発言内容, '整備': 整備, '目的': 目的, '発意': 発意, 
@@ -581,6 +965,7 @@ def add_case():
                     'date_added': firestore.SERVER_TIMESTAMP 
                 }
                 firestore_db.collection(COLLECTION_NAME).document(doc_id).set(doc_data)
+                record_group_removal(firestore_db, doc_id, old_group_name, 整備名)
 
             else: 
                 conn = sqlite3.connect(DATABASE)
@@ -592,6 +977,7 @@ def add_case():
                 conn.commit()
                 conn.close()
 
+            invalidate_case_table()
             return jsonify({'success': True, 'message': '事例が追加されました。'})
         except Exception as e:
             if 'firebase_admin' not in globals() or not firebase_admin._apps:
@@ -599,57 +985,214 @@ def add_case():
                     conn.rollback()
             return jsonify({'success': False, 'message': f'データの追加に失敗しました: {str(e)}'}), 500
 
-    @app.route('/api/cases/update')
-    def update_case():
-        if request.method == 'POST':
-            data = request.get_json()
-            
-            事例 = data.get('事例') 
-            緯度 = data.get('緯度') 
-            経度 = data.get('経度') 
-            写真 = data.get('写真') 
+@app.route('/api/cases/update', methods=['POST'])
+def update_case():
+    if request.method == 'POST':
+        data = request.get_json()
+        
+        事例 = data.get('事例') 
+        整備名 = data.get('整備名')
+        緯度 = data.get('緯度') 
+        経度 = data.get('経度') 
+        写真 = data.get('写真') 
 
-            if not 事例: 
-                return jsonify({'success': False, 'message': '事例IDは必須です。'}), 400
+        if not 事例: 
+            return jsonify({'success': False, 'message': '事例IDは必須です。'}), 400
 
-            firestore_db = get_firestore_db() 
-            try:
-                doc_id = str(事例)
-                update_data = {
-                    '整備名': 整備名, 
-                    '発言者': data.get('発言者'), '発言内容': data.get('発言内容'), '整備': data.get('整備'), 
-                    '目的': data.get('目的'), '発意': data.get('発意'), '実行': data.get('実行'), 
-                    '費用': data.get('費用'), '契機': data.get('契機'), '時期': data.get('時期'), 
-                    '所有': data.get('所有'), '管理': data.get('管理'), '利用': data.get('利用'), 
-                    '緯度': 緯度, '経度': 経度, '写真': 写真
-                }
-                firestore_db.collection(COLLECTION_NAME).document(doc_id).update(update_data)
+        firestore_db = get_firestore_db() 
+        try:
+            doc_id = str(事例)
+            old_group_name = get_current_group_name(firestore_db, doc_id)
+            update_data = {
+                '整備名': 整備名, 
+                '発言者': data.get('発言者'), '発言内容': data.get('発言内容'), '整備': data.get('整備'), 
+                '目的': data.get('目的'), '発意': data.get('発意'), '実行': data.get('実行'), 
+                '費用': data.get('費用'), '契機': data.get('契機'), '時期': data.get('時期'), 
+                '所有': data.get('所有'), '管理': data.get('管理'), '利用': data.get('利用'), 
+                '緯度': 緯度, '経度': 経度, '写真': 写真,
+                'date_updated': firestore.SERVER_TIMESTAMP
+            }
+            firestore_db.collection(COLLECTION_NAME).document(doc_id).update(update_data)
+            record_group_removal(firestore_db, doc_id, old_group_name, 整備名)
+            invalidate_case_table()
+
+            return jsonify({'success': True, 'message': '事例が更新されました。'})
+        except Exception as e:
+            return jsonify({'success': False, 'message': f'データの更新に失敗しました: {str(e)}'}), 500
 
-                return jsonify({'success': True, 'message': '事例が更新されました。'})
-            except Exception as e:
-                return jsonify({'success': False, 'message': f'データの更新に失敗しました: {str(e)}'}), 500
+@app.route('/api/cases/delete', methods=['POST'])
+def delete_case():
+    if request.method == 'POST':
+        data = request.get_json()
+        事例 = data.get('事例') 
 
-    @app.route('/api/cases/delete', methods=['POST'])
-    def delete_case():
-        if request.method == 'POST':
-            data = request.get_json()
-            事例 = data.get('事例') 
+        if not 事例:
+            return jsonify({'success': False, 'message': '削除する事例IDが指定されていません。'}), 400
 
-            if not 事例:
-                return jsonify({'success': False, 'message': '削除する事例IDが指定されていません。'}), 400
+        firestore_db = get_firestore_db() 
+        try:
+            doc_id = str(事例)
+            old_group_name = get_current_group_name(firestore_db, doc_id)
+            firestore_db.collection(COLLECTION_NAME).document(doc_id).delete()
+            record_group_removal(firestore_db, doc_id, old_group_name, None)
+            invalidate_case_table()
 
-            firestore_db = get_firestore_db() 
-            try:
-                doc_id = str(事例)
-                firestore_db.collection(COLLECTION_NAME).document(doc_id).delete()
+            return jsonify({'success': True, 'message': f'事例 {事例} が削除されました。'})
+        except Exception as e:
+            return jsonify({'success': False, 'message': f'データの削除に失敗しました: {str(e)}'}), 500
+
+# ★新規追加: 管理画面からの一括書き込み用APIエンドポイント
+# リクエスト: {"upserts": [{"事例": "R-01", "整備名": ..., ...}, ...], "deletes": ["R-02", ...]}
+#   upserts: 既存の事例は送られた項目のみ更新し、新しい事例は add_case と同じく全項目を保存する
+#   deletes: 削除する事例ID
+# 検証に通った書き込みを BATCH_CHUNK_SIZE 件ずつ WriteBatch でコミットし、1件ごとの結果を返す
+# キャッシュの無効化はバッチ全体で1回だけ行う
+@app.route('/api/cases/batch', methods=['POST'])
+def batch_cases():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'リクエストの形式が正しくありません。'}), 400
+
+    upserts = data.get('upserts') or []
+    deletes = data.get('deletes') or []
+    if not isinstance(upserts, list) or not isinstance(deletes, list):
+        return jsonify({'success': False, 'message': 'upserts と deletes はリストで指定してください。'}), 400
+    if len(upserts) + len(deletes) > BATCH_MAX_ITEMS:
+        return jsonify({'success': False, 'message': f'一度に送信できるのは {BATCH_MAX_ITEMS} 件までです。'}), 400
+
+    # 1. 検証
+    results = []
+    operations = [] # [(結果のインデックス, 'upsert' or 'delete', 事例ID, 項目)]
+    seen_ids = set()
+    for op, items in (('upsert', upserts), ('delete', deletes)):
+        for item in items:
+            case_id, fields, error = validate_batch_item(op, item)
+            if error is None and case_id in seen_ids:
+                error = '同じ事例IDがバッチ内で重複しています。'
+            results.append({'op': op, '事例': case_id, 'success': error is None, 'message': error})
+            if error is None:
+                seen_ids.add(case_id)
+                operations.append((len(results) - 1, op, case_id, fields))
+
+    if operations:
+        # 書き込み先は読み込みと同じデータソースにする（CASES_DATA_SOURCE=standin のときは firebase_admin を初期化しないが、
+        # db は合成データの StandInFirestore なので、Firestoreと同じ経路で書き込む）
+        if db is not None:
+            commit_batch_to_firestore(operations, results)
+        else:
+            commit_batch_to_sqlite(operations, results)
+        invalidate_case_table()
+
+    succeeded = sum(1 for result in results if result['success'])
+    print(f"DEBUG (API): Batch write finished: {succeeded} succeeded, {len(results) - succeeded} failed")
+    return jsonify({
+        'success': succeeded == len(results),
+        'message': f'{succeeded} 件の書き込みに成功しました。' + (f' {len(results) - succeeded} 件は失敗しました。' if succeeded < len(results) else ''),
+        'results': results
+    })
+
+# バッチの1件を検証し、(事例ID, 保存する項目, エラーメッセージ) を返す
+def validate_batch_item(op, item):
+    if op == 'delete':
+        if isinstance(item, dict):
+            item = item.get('事例')
+        if item is None or str(item).strip() == '':
+            return None, None, '削除する事例IDが指定されていません。'
+        return str(item).strip(), None, None
+
+    if not isinstance(item, dict):
+        return None, None, '事例はオブジェクトで指定してください。'
+    case_id = item.get('事例')
+    if case_id is None or str(case_id).strip() == '':
+        return None, None, '事例IDは必須です。'
+    fields = {field: item[field] for field in CASE_FIELDS if field in item}
+    for field in ['緯度', '経度']:
+        value = fields.get(field)
+        if value is None or value == '':
+            if field in fields:
+                fields[field] = None
+            continue
+        try:
+            fields[field] = float(value)
+        except (TypeError, ValueError):
+            return str(case_id).strip(), None, f'{field}は数値で指定してください。'
+    return str(case_id).strip(), fields, None
 
-                return jsonify({'success': True, 'message': f'事例 {事例} が削除されました。'})
-            except Exception as e:
-                return jsonify({'success': False, 'message': f'データの削除に失敗しました: {str(e)}'}), 500
+def commit_batch_to_firestore(operations, results):
+    firestore_db = get_firestore_db()
+    cases_ref = firestore_db.collection(COLLECTION_NAME)
+    changes_ref = firestore_db.collection(CHANGES_COLLECTION_NAME)
 
-    @app.route('/images/<path:filename>')
-    def serve_image(filename):
-        return send_from_directory(os.path.join(app.root_path, 'static', 'images'), filename)
+    for start in range(0, len(operations), BATCH_CHUNK_SIZE):
+        chunk = operations[start:start + BATCH_CHUNK_SIZE]
+        try:
+            # 既存ドキュメントをまとめて読み、新規/更新の判定と整備名の変更検出に使う
+            refs = [cases_ref.document(case_id) for _, _, case_id, _ in chunk]
+            existing = {doc.id: doc.to_dict() for doc in firestore_db.get_all(refs) if doc.exists}
+
+            batch = firestore_db.batch()
+            for (index, op, case_id, fields), ref in zip(chunk, refs):
+                old_group_name = existing[case_id].get('整備名') if case_id in existing else None
+                new_group_name = None
+                if op == 'delete':
+                    batch.delete(ref)
+                elif case_id in existing:
+                    batch.update(ref, dict(fields, date_updated=firestore.SERVER_TIMESTAMP))
+                    new_group_name = fields.get('整備名', old_group_name)
+                else:
+                    doc_data = {field: fields.get(field) for field in CASE_FIELDS}
+                    doc_data['date_added'] = firestore.SERVER_TIMESTAMP
+                    batch.set(ref, doc_data)
+                    new_group_name = doc_data['整備名']
+                # 変更ログも同じバッチで書き込む（record_group_removal と同じ内容）
+                if old_group_name is not None and old_group_name != new_group_name:
+                    batch.set(changes_ref.document(), {
+                        '整備名': old_group_name, '事例': case_id, 'changed_at': firestore.SERVER_TIMESTAMP
+                    })
+            batch.commit()
+        except Exception as e:
+            print(f"ERROR: Batch write failed for items {start}-{start + len(chunk) - 1}: {e}")
+            for index, _, _, _ in chunk:
+                results[index]['success'] = False
+                results[index]['message'] = f'データの書き込みに失敗しました: {str(e)}'
+    prune_case_changes(firestore_db)
+
+# ローカル（SQLite）の場合は、バッチ全体を1つのトランザクションで書き込む
+# ローカルの ryojo_customization.db は古いスキーマ（'整備名'列がない）のままなので、テーブルにある列だけを書き込む
+def commit_batch_to_sqlite(operations, results):
+    conn = sqlite3.connect(DATABASE)
+    try:
+        with conn:
+            cursor = conn.cursor()
+            table_columns = {row[1] for row in cursor.execute('PRAGMA table_info(cases)')}
+            writable_fields = [field for field in CASE_FIELDS if field in table_columns]
+            if len(writable_fields) < len(CASE_FIELDS):
+                print(f"DEBUG: SQLite table 'cases' has no columns {[field for field in CASE_FIELDS if field not in table_columns]}. They are not saved.")
+            for index, op, case_id, fields in operations:
+                if op == 'delete':
+                    cursor.execute('DELETE FROM cases WHERE 事例 = ?', (case_id,))
+                    continue
+                existing = cursor.execute('SELECT 1 FROM cases WHERE 事例 = ?', (case_id,)).fetchone()
+                fields = {field: value for field, value in fields.items() if field in table_columns}
+                if existing and fields:
+                    assignments = ', '.join(f'{field} = ?' for field in fields)
+                    cursor.execute(f'UPDATE cases SET {assignments} WHERE 事例 = ?', (*fields.values(), case_id))
+                elif not existing:
+                    columns = ['事例'] + writable_fields
+                    cursor.execute(
+                        f"INSERT INTO cases ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                        (case_id, *(fields.get(field) for field in writable_fields))
+                    )
+    except Exception as e:
+        for index, _, _, _ in operations:
+            results[index]['success'] = False
+            results[index]['message'] = f'データの書き込みに失敗しました: {str(e)}'
+    finally:
+        conn.close()
+
+@app.route('/images/<path:filename>')
+def serve_image(filename):
+    return send_from_directory(os.path.join(app.root_path, 'static', 'images'), filename)
 
 if __name__ == '__main__':
     app.run(debug=True)
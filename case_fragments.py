@@ -0,0 +1,88 @@
+import functools
+
+import pandas as pd
+from markupsafe import escape
+
+from case_table import ATTRIBUTE_COLUMNS, STATEMENT_COLUMN, unique_values
+
+# --- 事例カード・地図ポップアップ用のHTML部品 ---
+# 発言1行分のHTMLは、行の値のタプル（ハッシュ可能）をキーにしてキャッシュする。
+# 事例が1件変わっても、作り直すのはその行のHTMLだけで、残りはキャッシュ済みの部品を組み合わせる。
+# 利用者が入力した文字列はすべてエスケープしてからHTMLに入れる。
+STATEMENT_DETAIL_COLUMNS = ['発言者', '目的', '発意', '時期'] # 発言の後ろに ( ) で添える項目
+STATEMENT_ROW_COLUMNS = [STATEMENT_COLUMN, '整備'] + STATEMENT_DETAIL_COLUMNS
+STATEMENT_FRAGMENT_CACHE_SIZE = 50000 # キャッシュする発言HTMLの数（事例データの行数より十分大きくする）
+OTHER_SEIBI_LABEL = 'その他整備' # '整備'が空の発言をまとめる見出し
+NO_SUMMARY_HTML = '<p>概要情報がありません。</p>'
+NO_STATEMENTS_HTML = '<p>発言内容がありません。</p>'
+STATEMENTS_HEADING_HTML = '<h4>ヒアリング内容:</h4>'
+# ----------------------------------------------
+
+
+def _cell_text(value):
+    """欠損値はNone、それ以外は前後の空白を除いた文字列にする（NaNのままだとキャッシュのキーが一致しないため）"""
+    if value is None or pd.isna(value):
+        return None
+    return str(value).strip()
+
+
+def statement_rows(group):
+    """グループの各行を (発言内容, 整備, 発言者, 目的, 発意, 時期) のタプルにして返す関数"""
+    columns = [group[col].tolist() for col in STATEMENT_ROW_COLUMNS]
+    return [tuple(_cell_text(value) for value in values) for values in zip(*columns)]
+
+
+@functools.lru_cache(maxsize=STATEMENT_FRAGMENT_CACHE_SIZE)
+def render_statement(row, include_seibi):
+    """発言1行分のHTML。発言内容がない（または'不明'）ならNone"""
+    statement, seibi, *details = row
+    if not statement or statement == '不明':
+        return None
+
+    detail_parts = []
+    if include_seibi and seibi and seibi != OTHER_SEIBI_LABEL:
+        detail_parts.append(f"整備: {seibi}")
+    detail_parts.extend(f"{col}: {value}" for col, value in zip(STATEMENT_DETAIL_COLUMNS, details) if value and value != '不明')
+
+    if detail_parts:
+        return f"<p><strong>・{escape(statement)}</strong><br>({escape(', '.join(detail_parts))})</p>"
+    return f"<p><strong>・{escape(statement)}</strong></p>"
+
+
+def render_summary_html(group):
+    """概要情報（属性ごとの値の一覧）のHTML"""
+    parts = []
+    for col in ATTRIBUTE_COLUMNS:
+        values = unique_values(group[col])
+        if values:
+            parts.append(f"<p><strong>{col}:</strong> {escape(', '.join(map(str, values)))}</p>")
+    return ''.join(parts) or NO_SUMMARY_HTML
+
+
+def render_speakers_html(group):
+    """発言者の一覧（カンマ区切り）のHTML。発言者がいなければ'不明'"""
+    speakers = unique_values(group['発言者'])
+    return str(escape(', '.join(map(str, speakers)))) if speakers else '不明'
+
+
+def render_case_card(group):
+    """地図・事例一覧用: (概要HTML, 発言HTML, ポップアップ用HTML) を返す。発言には整備の種類も添える"""
+    fragments = [fragment for fragment in (render_statement(row, True) for row in statement_rows(group)) if fragment]
+    statements_html = ''.join(fragments)
+    popup_html = STATEMENTS_HEADING_HTML + (f"<div>{statements_html}</div>" if fragments else NO_STATEMENTS_HTML)
+    return render_summary_html(group), statements_html or NO_STATEMENTS_HTML, popup_html
+
+
+def render_customize_card(group):
+    """カスタマイズ事例用: (概要HTML, 整備ごとに見出しを付けた発言HTML, ポップアップ用HTML) を返す"""
+    fragments_by_seibi = {} # 整備の種類 -> 発言HTMLのリスト（最初に出てきた順）
+    for row in statement_rows(group):
+        fragment = render_statement(row, False)
+        if fragment:
+            fragments_by_seibi.setdefault(row[1] or OTHER_SEIBI_LABEL, []).append(fragment)
+
+    statements_html = ''.join(
+        f"<h5>{escape(seibi)}:</h5><div>{''.join(fragments)}</div>" for seibi, fragments in fragments_by_seibi.items()
+    ) or NO_STATEMENTS_HTML
+    summary_html = render_summary_html(group)
+    return summary_html, statements_html, summary_html + STATEMENTS_HEADING_HTML + statements_html
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+# --- 事例テーブルの列定義 ---
+# 概要として集計する属性列（値の種類が少なく、繰り返し出現する）
+ATTRIBUTE_COLUMNS = ['整備', '目的', '発意', '実行', '費用', '契機', '時期', '所有', '管理', '利用']
+# 辞書エンコード（category型）で保持する列
+CATEGORICAL_COLUMNS = ['事例', '整備名', '発言者'] + ATTRIBUTE_COLUMNS + ['写真']
+# float32で保持する座標列
+COORDINATE_COLUMNS = ['緯度', '経度']
+# 発言内容は行ごとにほぼ一意なので、文字列のまま一度だけ保持する
+STATEMENT_COLUMN = '発言内容'
+# 差分同期用: 各行の最終更新時刻（add_case の date_added / 更新時の date_updated）をバージョン番号として保持する列
+VERSION_COLUMN = '更新日時'
+TIMESTAMP_COLUMNS = ['date_added', 'date_updated']
+CASE_TABLE_COLUMNS = CATEGORICAL_COLUMNS + [STATEMENT_COLUMN] + COORDINATE_COLUMNS + [VERSION_COLUMN]
+
+# カスタマイズ事例として扱う発意のキーワード
+CUSTOMIZE_INITIATIVE_KEYWORDS = ('個人', '自治会')
+# ----------------------------
+
+
+def build_case_table(all_raw_cases):
+    """Firestoreから取得した事例（dictのリスト）を、全エンドポイント共通のコンパクトなDataFrameに変換する関数"""
+    df = pd.DataFrame(all_raw_cases)
+    versions = [timestamps_to_versions(df[col]) for col in TIMESTAMP_COLUMNS if col in df.columns]
+    df[VERSION_COLUMN] = pd.concat(versions, axis=1).max(axis=1) if versions else 0
+    # 欠けている列はNaNで補い、不要な列（date_addedなど）は持たない
+    df = df.reindex(columns=CASE_TABLE_COLUMNS)
+    df[VERSION_COLUMN] = df[VERSION_COLUMN].fillna(0).astype(np.int64)
+
+    for col in CATEGORICAL_COLUMNS:
+        df[col] = df[col].astype('category')
+    for col in COORDINATE_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype(np.float32)
+    df[STATEMENT_COLUMN] = df[STATEMENT_COLUMN].astype(object)
+    return df
+
+
+def timestamps_to_versions(values):
+    """タイムスタンプ（FirestoreのTimestampや日時文字列）をバージョン番号（UNIX時間のマイクロ秒, int）に変換する関数。欠損は0"""
+    timestamps = pd.to_datetime(pd.Series(values, dtype=object), utc=True, errors='coerce', format='mixed')
+    versions = (timestamps - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(microseconds=1)
+    return versions.fillna(0).astype(np.int64)
+
+
+def table_content_hash(table):
+    """事例テーブルの内容のハッシュ（int）。行ごとのハッシュの和なので行の並び順によらず、
+    category型のカテゴリの構成にもよらない（値だけで決まる）"""
+    return int(pd.util.hash_pandas_object(table[CASE_TABLE_COLUMNS], index=False).sum())
+
+
+def coordinate_to_float(value):
+    """float32の座標をJSON用のfloatに戻す関数（NaNはNone、表示桁はfloat32の最短表現に揃える）"""
+    if value is None or pd.isna(value):
+        return None
+    return float(str(np.float32(value)))
+
+
+def matching_rows(series, predicate):
+    """category型の列について、カテゴリ（ユニーク値）ごとに一度だけpredicateを評価して行のマスクを返す関数"""
+    categories = series.cat.categories
+    matched = [category for category in categories if predicate(category)]
+    return series.isin(matched)
+
+
+def filter_customize_cases(table):
+    """'発意'が「個人」または「自治会」を含む事例のみを返す関数（カンマ区切りの複数発意も考慮）"""
+    mask = matching_rows(
+        table['発意'],
+        lambda x: isinstance(x, str) and any(keyword in x for keyword in CUSTOMIZE_INITIATIVE_KEYWORDS)
+    )
+    return table[mask]
+
+
+def unique_values(series):
+    """列のユニークな値（NaN除く）を出現順のリストで返す関数"""
+    return series.dropna().unique().tolist()
+
+
+def count_split_items(series, exclude=('不明',)):
+    """カンマ区切りの値を個別の項目に展開して件数を数える関数（カテゴリごとに一度だけ分割する）"""
+    counts = {}
+    value_counts = series.value_counts(sort=False)
+    for value, n in value_counts.items():
+        if n == 0:
+            continue
+        for item in str(value).split(','):
+            item = item.strip()
+            if item and item not in exclude:
+                counts[item] = counts.get(item, 0) + int(n)
+    return counts
+
+
+def scalar_or_none(value):
+    """NaN（欠損値）をNoneに置き換える関数（JSONにNaNを出力しないため）"""
+    if value is None or pd.isna(value):
+        return None
+    return value
@@ -2,14 +2,27 @@ import firebase_admin
 from firebase_admin import credentials, firestore
 import os
 import json
+import hashlib
+import struct
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd # pandasはFirestoreからのデータ処理には必須ではないが、データ確認に便利
 
+# Pillowがあれば画像を実際にデコードして破損を検出する（なければヘッダーと終端マーカーのみ確認）
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
 # --- Configuration Settings ---
 # Path to your Firebase service account key file
 # ローカルで実行する場合は、このファイルがプロジェクトのルートディレクトリにあることを想定
-SERVICE_ACCOUNT_KEY_PATH = 'firebase_service_account.json' 
+SERVICE_ACCOUNT_KEY_PATH = 'firebase_service_account.json'
 COLLECTION_NAME = 'cases' # Firestoreのコレクション名
 IMAGES_FOLDER_PATH = 'static/images' # 画像ファイルが置かれているフォルダのパス
+IMAGE_MANIFEST_PATH = 'image_manifest.json' # 画像ごとのハッシュ・サイズを保存するマニフェスト（mtimeが変わったファイルのみ再計算）
+MAX_WORKERS = 8 # 画像の読み込み・デコードを並列に行うスレッド数
+OVERSIZE_BYTES = 1024 * 1024 # これを超えるファイルサイズは大きすぎる画像として報告 (1MB)
+OVERSIZE_PIXELS = 2048 # 長辺がこれを超える画像は大きすぎる画像として報告
 # ----------------------------
 
 # Initialize Firebase Admin SDK
@@ -26,7 +39,7 @@ try:
                 cred = credentials.Certificate(SERVICE_ACCOUNT_KEY_PATH)
             else:
                 raise FileNotFoundError(f"Service account key file not found at {SERVICE_ACCOUNT_KEY_PATH} and SERVICE_ACCOUNT_JSON_DATA env var not set.")
-        
+
         firebase_admin.initialize_app(cred)
     db = firestore.client()
     print("Firebase Admin SDK initialized successfully.")
@@ -35,6 +48,105 @@ except Exception as e:
     print("Please ensure 'firebase_service_account.json' is in the root directory OR SERVICE_ACCOUNT_JSON_DATA env var is set.")
     exit(1) # Firebaseの初期化に失敗したらスクリプトを終了
 
+def read_image_header(data):
+    """Pillowがない場合に、PNG/JPEGのヘッダーから (形式, 幅, 高さ) を読み取る関数。壊れていればValueErrorを送出"""
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        if len(data) < 24 or data[12:16] != b'IHDR':
+            raise ValueError("PNGのIHDRチャンクが見つかりません")
+        if not data.rstrip(b'\x00').endswith(b'IEND\xaeB`\x82'):
+            raise ValueError("PNGの終端 (IEND) がありません。ファイルが途中で切れている可能性があります")
+        width, height = struct.unpack('>II', data[16:24])
+        return 'PNG', width, height
+
+    if data.startswith(b'\xff\xd8'):
+        if not data.rstrip(b'\x00').endswith(b'\xff\xd9'):
+            raise ValueError("JPEGの終端 (EOI) がありません。ファイルが途中で切れている可能性があります")
+        # SOFマーカーを探して幅と高さを取得
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                raise ValueError(f"JPEGのマーカーが不正です (offset {i})")
+            marker = data[i + 1]
+            if marker == 0xFF:
+                i += 1
+                continue
+            segment_length = struct.unpack('>H', data[i + 2:i + 4])[0]
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack('>HH', data[i + 5:i + 9])
+                return 'JPEG', width, height
+            i += 2 + segment_length
+        raise ValueError("JPEGのSOFマーカーが見つかりません")
+
+    raise ValueError("未対応の画像形式です (PNG/JPEG以外)")
+
+def inspect_image(path):
+    """画像ファイル1つを読み込み、ハッシュ・バイト数・寸法・破損の有無を調べる関数（スレッドプールから呼ばれる）"""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    entry = {
+        'sha256': hashlib.sha256(data).hexdigest(),
+        'bytes': len(data),
+        'format': None,
+        'width': None,
+        'height': None,
+        'error': None,
+    }
+    try:
+        if Image is not None:
+            with Image.open(path) as img:
+                img.load() # 全体をデコードして、途中で切れたファイルも検出する
+                entry['format'] = img.format
+                entry['width'], entry['height'] = img.size
+        else:
+            entry['format'], entry['width'], entry['height'] = read_image_header(data)
+    except Exception as e:
+        entry['error'] = str(e)
+    return entry
+
+def load_image_manifest():
+    if os.path.exists(IMAGE_MANIFEST_PATH):
+        try:
+            with open(IMAGE_MANIFEST_PATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"   警告: マニフェスト '{IMAGE_MANIFEST_PATH}' を読み込めませんでした。全ての画像を再計算します: {e}")
+    return {}
+
+def save_image_manifest(manifest):
+    with open(IMAGE_MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+def scan_local_images():
+    """static/images内の画像をスレッドプールで調べ、マニフェスト（ファイル名 -> 情報）を返す関数。前回から変わっていないファイルは再計算しない"""
+    previous_manifest = load_image_manifest()
+    manifest = {}
+    changed_files = []
+
+    for filename in os.listdir(IMAGES_FOLDER_PATH):
+        path = os.path.join(IMAGES_FOLDER_PATH, filename)
+        if not os.path.isfile(path):
+            continue
+        stat = os.stat(path)
+        cached = previous_manifest.get(filename)
+        if cached and cached.get('mtime_ns') == stat.st_mtime_ns and cached.get('bytes') == stat.st_size:
+            manifest[filename] = cached
+        else:
+            changed_files.append((filename, path, stat.st_mtime_ns))
+
+    print(f"   {len(manifest)} 個はマニフェストから再利用、{len(changed_files)} 個を新たに読み込みます (スレッド数: {MAX_WORKERS})。")
+    if Image is None and changed_files:
+        print("   注意: Pillowがインストールされていないため、PNG/JPEGのヘッダーと終端のみで破損を確認します。")
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = executor.map(inspect_image, [path for _, path, _ in changed_files])
+        for (filename, _, mtime_ns), entry in zip(changed_files, results):
+            entry['mtime_ns'] = mtime_ns
+            manifest[filename] = entry
+
+    save_image_manifest(manifest)
+    return manifest
+
 def check_image_consistency():
     print("\n--- 画像ファイル名の一致確認を開始します ---")
 
@@ -42,7 +154,7 @@ def check_image_consistency():
     print(f"1. Firestoreコレクション '{COLLECTION_NAME}' から画像ファイル名を取得中...")
     db_image_filenames_raw = {} # {小文字ファイル名: 元のファイル名} の辞書
     db_image_filenames_lower = set() # 小文字に統一したファイル名のセット
-    
+
     try:
         docs = db.collection(COLLECTION_NAME).stream()
         for doc in docs:
@@ -58,18 +170,18 @@ def check_image_consistency():
         print(f"エラー: Firestoreからのデータ取得中に問題が発生しました: {e}")
         return
 
-    # 2. ローカルのstatic/imagesフォルダから画像ファイル名を取得
-    print(f"2. ローカルフォルダ '{IMAGES_FOLDER_PATH}' から画像ファイル名を取得中...")
+    # 2. ローカルのstatic/imagesフォルダの画像を読み込み、ハッシュと寸法を取得
+    print(f"2. ローカルフォルダ '{IMAGES_FOLDER_PATH}' の画像を確認中...")
     local_image_filenames_raw = {} # {小文字ファイル名: 元のファイル名} の辞書
     local_image_filenames_lower = set() # 小文字に統一したファイル名のセット
-    
+
     if os.path.exists(IMAGES_FOLDER_PATH) and os.path.isdir(IMAGES_FOLDER_PATH):
-        for filename in os.listdir(IMAGES_FOLDER_PATH):
-            if os.path.isfile(os.path.join(IMAGES_FOLDER_PATH, filename)):
-                original_filename = filename.strip()
-                lower_filename = original_filename.lower()
-                local_image_filenames_raw[lower_filename] = original_filename # 小文字キーで元の名前を保存
-                local_image_filenames_lower.add(lower_filename)
+        manifest = scan_local_images()
+        for filename in manifest:
+            original_filename = filename.strip()
+            lower_filename = original_filename.lower()
+            local_image_filenames_raw[lower_filename] = original_filename # 小文字キーで元の名前を保存
+            local_image_filenames_lower.add(lower_filename)
         print(f"   ローカルフォルダから {len(local_image_filenames_lower)} 個の画像ファイルを見つけました。")
     else:
         print(f"エラー: 画像フォルダ '{IMAGES_FOLDER_PATH}' が見つからないか、ディレクトリではありません。")
@@ -102,7 +214,7 @@ def check_image_consistency():
     for filename_lower in db_image_filenames_lower.intersection(local_image_filenames_lower):
         if db_image_filenames_raw[filename_lower] != local_image_filenames_raw[filename_lower]:
             case_mismatches.append(f"Firestore: '{db_image_filenames_raw[filename_lower]}' vs Local: '{local_image_filenames_raw[filename_lower]}'")
-    
+
     if case_mismatches:
         print("⚠️ ファイル名の大文字小文字がFirestoreとローカルフォルダで一致しない可能性があります:")
         for mismatch in sorted(case_mismatches):
@@ -111,11 +223,49 @@ def check_image_consistency():
     else:
         print("✅ 大文字小文字の不一致は見つかりませんでした。")
 
-    if missing_in_local_lower or not_referenced_in_db_lower or case_mismatches:
+    # 4. 画像の中身の確認（重複・破損・サイズ超過）
+    print("\n--- 画像ファイルの中身の確認 ---")
+
+    # 内容（SHA-256）が同じファイル
+    filenames_by_hash = {}
+    for filename, entry in manifest.items():
+        filenames_by_hash.setdefault(entry['sha256'], []).append(filename)
+    duplicates = [sorted(filenames) for filenames in filenames_by_hash.values() if len(filenames) > 1]
+    if duplicates:
+        print("⚠️ 内容が同じ（重複している）画像ファイル:")
+        for filenames in sorted(duplicates):
+            print(f"   - {' = '.join(filenames)}")
+    else:
+        print("✅ 重複している画像ファイルはありません。")
+
+    # 読み込めない（破損している）ファイル
+    corrupt_files = sorted(filename for filename, entry in manifest.items() if entry['error'])
+    if corrupt_files:
+        print("\n❌ 破損している、または画像として読み込めないファイル:")
+        for filename in corrupt_files:
+            print(f"   - {filename} ({manifest[filename]['error']})")
+    else:
+        print("\n✅ 全ての画像ファイルを正常に読み込めました。")
+
+    # 大きすぎるファイル
+    oversize_files = sorted(
+        filename for filename, entry in manifest.items()
+        if entry['bytes'] > OVERSIZE_BYTES or max(entry['width'] or 0, entry['height'] or 0) > OVERSIZE_PIXELS
+    )
+    if oversize_files:
+        print(f"\n⚠️ 大きすぎる画像ファイル ({OVERSIZE_BYTES // 1024}KB または 長辺 {OVERSIZE_PIXELS}px を超えるもの):")
+        for filename in oversize_files:
+            entry = manifest[filename]
+            print(f"   - {filename} ({entry['bytes'] // 1024}KB, {entry['width']}x{entry['height']})")
+        print("   -> **推奨: 縮小・圧縮してから配置してください。**")
+    else:
+        print("\n✅ 大きすぎる画像ファイルはありません。")
+
+    if missing_in_local_lower or not_referenced_in_db_lower or case_mismatches or duplicates or corrupt_files or oversize_files:
         print("\n上記の問題を修正し、Excelデータを更新後、再度 `python initialize_db.py` を実行してください。")
     else:
         print("\n全ての画像ファイル名がFirestoreとローカルフォルダで一致しており、問題ありません。")
-    
+
     print("\n--- 画像ファイル名の一致確認を終了します ---")
 
 if __name__ == '__main__':
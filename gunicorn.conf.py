@@ -0,0 +1,22 @@
+import os
+
+# --- gunicorn の設定（Procfile から -c gunicorn.conf.py で読み込む） ---
+# どの値も環境変数で上書きできる。load_test.py で組み合わせを比べてから本番の値を決める。
+# 事例テーブルのキャッシュ（CASE_TABLE_TTL_SECONDS）が効いている間は、応答時間の大半がJSON・HTMLの組み立て（CPU）なので
+# 既定は以前と同じ sync とし、Firestoreの待ち時間が支配的になる環境では gthread / gevent に切り替える。
+#   sync   : 1ワーカー1リクエスト。Firestoreを待つ間ワーカーが塞がる
+#   gthread: 1ワーカーあたり GUNICORN_THREADS 本のスレッドで並行に処理する
+#   gevent : 協調スレッドで多数の接続を処理する（gevent のインストールが必要）
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+# 既定は以前の gunicorn と同じ WEB_CONCURRENCY（なければ1）。事例テーブル・描画済みページ・表示位置のキャッシュはワーカーごとに持つので、
+# ワーカーを増やすとその分メモリを使い、書き込み直後は他のワーカーが CASE_TABLE_TTL_SECONDS の間古いデータを返すことがある
+workers = int(os.environ.get('GUNICORN_WORKERS', os.environ.get('WEB_CONCURRENCY', 1)))
+# gunicorn は threads が2以上だと sync ワーカーを gthread に切り替えるので、既定は gthread のときだけ4、それ以外は1にする
+threads = int(os.environ.get('GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100)) # gevent のときだけ使われる
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60)) # Firestoreの全件読み込みがこれより長いとワーカーが再起動される
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+accesslog = os.environ.get('GUNICORN_ACCESSLOG') # '-' で標準出力にアクセスログを出す（負荷試験中は無効のまま）
+# -------------------------------------------------------------------------
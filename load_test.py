@@ -0,0 +1,225 @@
+import importlib.util
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# --- Configuration Settings ---
+# gunicorn のワーカー構成ごとにアプリを起動し、ページとAPIを混ぜた負荷をかけて
+# スループットと p50/p95/p99 のレイテンシを比べる。データは stand_in_data.py の合成データを使う（Firestoreには接続しない）。
+# 構成は "worker_class:workers:threads" をカンマ区切りで指定する（環境変数 LOAD_TEST_CONFIGS で上書き可）
+LOAD_TEST_CONFIGS = os.environ.get('LOAD_TEST_CONFIGS', 'sync:2:1,gthread:2:4,gthread:2:8,gevent:2:1')
+LOAD_TEST_PORT = int(os.environ.get('LOAD_TEST_PORT', 8765))
+LOAD_TEST_CONCURRENCY = int(os.environ.get('LOAD_TEST_CONCURRENCY', 16)) # 同時に送るクライアント数
+LOAD_TEST_DURATION_SECONDS = float(os.environ.get('LOAD_TEST_DURATION_SECONDS', 20))
+LOAD_TEST_WARMUP_SECONDS = float(os.environ.get('LOAD_TEST_WARMUP_SECONDS', 2)) # 計測前に流す負荷（キャッシュの準備）
+LOAD_TEST_REQUEST_TIMEOUT = float(os.environ.get('LOAD_TEST_REQUEST_TIMEOUT', 30))
+LOAD_TEST_RESULTS_PATH = 'load_test_results.json' # 結果をJSONで保存するファイル
+# アプリ側の設定（起動するgunicornにそのまま環境変数として渡す）
+# CASE_TABLE_TTL_SECONDS=0 にすると毎回データを読み直す最悪ケースを測れる
+APP_ENV = {
+    'CASES_DATA_SOURCE': 'standin',
+    'STANDIN_GROUPS': os.environ.get('STANDIN_GROUPS', '100'),
+    'STANDIN_STATEMENTS_PER_GROUP': os.environ.get('STANDIN_STATEMENTS_PER_GROUP', '4'),
+    'STANDIN_LATENCY_MS': os.environ.get('STANDIN_LATENCY_MS', '50'),
+    'CASE_TABLE_TTL_SECONDS': os.environ.get('CASE_TABLE_TTL_SECONDS', '60'),
+    # 負荷試験のリクエストはすべて同じIPから送るので、既定ではレート制限を外してワーカー構成だけを比べる
+    'RATE_LIMIT_ENABLED': os.environ.get('RATE_LIMIT_ENABLED', '0'),
+    'BUILD_CONCURRENCY': os.environ.get('BUILD_CONCURRENCY', '2'),
+}
+# 送るリクエストの種類と割合（ページ表示とデータAPIを混ぜる）
+REQUEST_MIX = [
+    ('/', 10),
+    ('/cases', 10),
+    ('/customize', 5),
+    ('/statistics', 5),
+    ('/api/cases', 25),
+    ('/api/cases?format=ndjson', 10),
+    ('/api/cases/changes?since=0', 5),
+    ('/api/customize_cases', 10),
+    ('/api/statistics', 10),
+    ('/api/historical_summary', 10),
+]
+# ----------------------------
+
+
+def parse_configs(spec):
+    configs = []
+    for item in spec.split(','):
+        worker_class, workers, threads = item.strip().split(':')
+        configs.append({'worker_class': worker_class, 'workers': int(workers), 'threads': int(threads)})
+    return configs
+
+
+def config_label(config):
+    if config['worker_class'] == 'gthread':
+        return f"{config['worker_class']} w={config['workers']} t={config['threads']}"
+    return f"{config['worker_class']} w={config['workers']}"
+
+
+def start_server(config):
+    env = dict(os.environ, **APP_ENV)
+    env.update({
+        'PORT': str(LOAD_TEST_PORT),
+        'GUNICORN_WORKER_CLASS': config['worker_class'],
+        'GUNICORN_WORKERS': str(config['workers']),
+        'GUNICORN_THREADS': str(config['threads']),
+    })
+    env.pop('GUNICORN_ACCESSLOG', None)
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_until_ready(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(base_url + '/api/cases', timeout=5) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def run_load(base_url, duration, seed):
+    """LOAD_TEST_CONCURRENCY 本のスレッドで duration 秒間リクエストを送り続け、(パス, 秒, 成功したか) のリストを返す"""
+    paths = [path for path, _ in REQUEST_MIX]
+    weights = [weight for _, weight in REQUEST_MIX]
+    deadline = time.monotonic() + duration
+    samples = []
+    samples_lock = threading.Lock()
+
+    def client(client_id):
+        rnd = random.Random(seed * 1000 + client_id)
+        local_samples = []
+        while time.monotonic() < deadline:
+            path = rnd.choices(paths, weights)[0]
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(base_url + path, timeout=LOAD_TEST_REQUEST_TIMEOUT) as response:
+                    response.read()
+                    ok = response.status == 200
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                ok = False
+            local_samples.append((path, time.perf_counter() - started, ok))
+        with samples_lock:
+            samples.extend(local_samples)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(LOAD_TEST_CONCURRENCY)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, duration):
+    latencies = sorted(latency for _, latency, ok in samples if ok)
+    errors = sum(1 for _, _, ok in samples if not ok)
+    summary = {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / duration, 1),
+        'p50_ms': None, 'p95_ms': None, 'p99_ms': None,
+        'by_path': {},
+    }
+    for p in (50, 95, 99):
+        value = percentile(latencies, p)
+        summary[f'p{p}_ms'] = round(value * 1000, 1) if value is not None else None
+    for path, _ in REQUEST_MIX:
+        path_latencies = sorted(latency for sample_path, latency, ok in samples if ok and sample_path == path)
+        if path_latencies:
+            summary['by_path'][path] = {
+                'requests': len(path_latencies),
+                'p50_ms': round(percentile(path_latencies, 50) * 1000, 1),
+                'p95_ms': round(percentile(path_latencies, 95) * 1000, 1),
+            }
+    return summary
+
+
+def format_ms(value):
+    return f'{value:8.1f}' if value is not None else '       -'
+
+
+def print_report(results):
+    print("\n--- 負荷試験の結果 ---")
+    print(f"同時クライアント数: {LOAD_TEST_CONCURRENCY}, 計測時間: {LOAD_TEST_DURATION_SECONDS}秒, "
+          f"合成データ: {APP_ENV['STANDIN_GROUPS']}グループ x {APP_ENV['STANDIN_STATEMENTS_PER_GROUP']}発言, "
+          f"擬似Firestore待ち時間: {APP_ENV['STANDIN_LATENCY_MS']}ms, キャッシュTTL: {APP_ENV['CASE_TABLE_TTL_SECONDS']}秒")
+    print(f"{'構成':<22}{'req/s':>9}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'エラー':>8}")
+    for result in results:
+        if result.get('skipped'):
+            print(f"{result['label']:<22}  スキップ: {result['skipped']}")
+            continue
+        s = result['summary']
+        print(f"{result['label']:<22}{s['throughput_rps']:9.1f}  {format_ms(s['p50_ms'])}  {format_ms(s['p95_ms'])}  {format_ms(s['p99_ms'])}{s['errors']:8d}")
+
+    for result in results:
+        if result.get('skipped'):
+            continue
+        print(f"\n[{result['label']}] エンドポイント別")
+        for path, stats in result['summary']['by_path'].items():
+            print(f"  {path:<32}{stats['requests']:7d} 件  p50 {format_ms(stats['p50_ms'])}ms  p95 {format_ms(stats['p95_ms'])}ms")
+
+
+def main():
+    base_url = f'http://127.0.0.1:{LOAD_TEST_PORT}'
+    results = []
+    for i, config in enumerate(parse_configs(LOAD_TEST_CONFIGS)):
+        label = config_label(config)
+        if config['worker_class'] == 'gevent' and importlib.util.find_spec('gevent') is None:
+            print(f"{label}: gevent がインストールされていないためスキップします。")
+            results.append({'label': label, 'config': config, 'skipped': 'gevent 未インストール'})
+            continue
+
+        print(f"{label}: gunicornを起動しています...")
+        process = start_server(config)
+        try:
+            if not wait_until_ready(base_url, process):
+                print(f"{label}: サーバーが起動しませんでした。")
+                results.append({'label': label, 'config': config, 'skipped': 'サーバー起動失敗'})
+                continue
+            run_load(base_url, LOAD_TEST_WARMUP_SECONDS, seed=i)
+            print(f"{label}: {LOAD_TEST_DURATION_SECONDS}秒間計測しています...")
+            samples = run_load(base_url, LOAD_TEST_DURATION_SECONDS, seed=i)
+            results.append({'label': label, 'config': config, 'summary': summarize(samples, LOAD_TEST_DURATION_SECONDS)})
+        finally:
+            stop_server(process)
+
+    print_report(results)
+    with open(LOAD_TEST_RESULTS_PATH, 'w', encoding='utf-8') as f:
+        json.dump({'app_env': APP_ENV, 'concurrency': LOAD_TEST_CONCURRENCY,
+                   'duration_seconds': LOAD_TEST_DURATION_SECONDS, 'results': results}, f, ensure_ascii=False, indent=2)
+    print(f"\n結果を {LOAD_TEST_RESULTS_PATH} に保存しました。")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import contextlib
+import gc
+import io
+import json
+import os
+import sys
+import tracemalloc
+
+# --- Configuration Settings ---
+# 合成データ（stand_in_data.py）でアプリを動かし、エンドポイントごとのメモリ使用量を tracemalloc で測る。
+#   peak    : リクエスト処理中に一時的に確保された最大量（DataFrameのコピー、グループごとのSeries、HTML文字列など）
+#   retained: リクエスト後も残っている量（事例テーブル、表示位置・ページ・発言HTMLのキャッシュなど）
+# cold はキャッシュを空にしてデータの読み込みから測り、warm は事例テーブルがキャッシュ済みの状態で測る。
+# cold の値が PEAK_LIMITS_MB / RETAINED_LIMITS_MB を超えたら終了コード1で終わる（メモリを減らす変更の効果の確認と、増加の検出に使う）。
+os.environ['CASES_DATA_SOURCE'] = 'standin'
+os.environ['STANDIN_LATENCY_MS'] = '0'
+os.environ['RATE_LIMIT_ENABLED'] = '0'
+os.environ['CASE_TABLE_TTL_SECONDS'] = '3600' # warm の計測中にキャッシュが切れないようにする
+
+CORPORA = {
+    # 名前: (整備名グループの数, 1グループあたりの発言数)
+    'small': (100, 4),
+    'medium': (500, 4),
+    'large': (1000, 8),
+}
+ENDPOINTS = [
+    '/api/cases',
+    '/api/cases?format=ndjson',
+    '/api/cases/changes?since=0',
+    '/api/customize_cases',
+    '/api/statistics',
+    '/api/historical_summary',
+    '/cases',
+    '/customize',
+    '/statistics',
+]
+# 上限 (MB)。requirements.txt の pandas 2.3.1 と pandas 3.0 で計測した値の大きい方の約1.5倍にしているので、メモリを減らす変更をしたら合わせて下げる
+# small の上限は test_memory_benchmark.py（pytest）でも確かめる
+# peak はエンドポイントごとの cold の peak、retained はそのコーパスでの cold の retained の最大値に対する上限
+PEAK_LIMITS_MB = {
+    'small': {
+        '/api/cases': 3.5, '/api/cases?format=ndjson': 2.5, '/api/cases/changes?since=0': 3.5,
+        '/api/customize_cases': 2.5, '/api/statistics': 1, '/api/historical_summary': 1,
+        '/cases': 2.5, '/customize': 2, '/statistics': 1,
+    },
+    'medium': {
+        '/api/cases': 13, '/api/cases?format=ndjson': 9.5, '/api/cases/changes?since=0': 14,
+        '/api/customize_cases': 9.5, '/api/statistics': 3.5, '/api/historical_summary': 3.5,
+        '/cases': 9, '/customize': 7, '/statistics': 3.5,
+    },
+    'large': {
+        '/api/cases': 40, '/api/cases?format=ndjson': 32, '/api/cases/changes?since=0': 40,
+        '/api/customize_cases': 28, '/api/statistics': 13, '/api/historical_summary': 13,
+        '/cases': 25, '/customize': 20, '/statistics': 13,
+    },
+}
+RETAINED_LIMITS_MB = {'small': 1.5, 'medium': 5.5, 'large': 20}
+# large は tracemalloc を付けると数分かかるので、既定では small と medium のみ測る
+MEMORY_BENCHMARK_CORPORA = os.environ.get('MEMORY_BENCHMARK_CORPORA', 'small,medium').split(',')
+MEMORY_BENCHMARK_RESULTS_PATH = 'memory_benchmark_results.json'
+# ----------------------------
+
+import app as ryojo_app # 環境変数を設定してから読み込む
+from case_fragments import render_statement
+from stand_in_data import StandInFirestore, generate_synthetic_cases
+
+
+def clear_app_caches():
+    ryojo_app.invalidate_case_table()
+    with ryojo_app._display_positions_lock:
+        ryojo_app._display_positions_cache.update({'key': None, 'positions': {}})
+    with ryojo_app._rendered_page_lock:
+        ryojo_app._rendered_page_cache.clear()
+    ryojo_app._last_payloads.clear()
+    render_statement.cache_clear()
+
+
+def measure_request(client, path):
+    """1リクエスト分の (peak, retained) をバイト単位で返す。アプリのデバッグ出力は捨てる"""
+    gc.collect()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    with contextlib.redirect_stdout(io.StringIO()):
+        response = client.get(path)
+        body = response.get_data() # ストリーミングの場合もここで最後まで読む
+        response.close()
+    status = response.status_code
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    del response, body
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    if status != 200:
+        raise RuntimeError(f"{path} returned HTTP {status}")
+    return peak, retained
+
+
+def run_corpus(name, n_groups, statements_per_group):
+    ryojo_app.db = StandInFirestore(generate_synthetic_cases(n_groups, statements_per_group), latency_ms=0)
+    client = ryojo_app.app.test_client()
+    results = {}
+    for path in ENDPOINTS:
+        clear_app_caches()
+        cold_peak, cold_retained = measure_request(client, path)
+        warm_peak, warm_retained = measure_request(client, path)
+        results[path] = {
+            'cold_peak_mb': round(cold_peak / 2**20, 2), 'cold_retained_mb': round(cold_retained / 2**20, 2),
+            'warm_peak_mb': round(warm_peak / 2**20, 2), 'warm_retained_mb': round(warm_retained / 2**20, 2),
+        }
+    clear_app_caches()
+    return results
+
+
+def main():
+    tracemalloc.start()
+    all_results = {}
+    failures = []
+    for name in MEMORY_BENCHMARK_CORPORA:
+        n_groups, statements_per_group = CORPORA[name]
+        print(f"\n--- {name}: {n_groups}グループ x {statements_per_group}発言 ({n_groups * statements_per_group}件), retained上限 {RETAINED_LIMITS_MB[name]} MB ---")
+        print(f"{'エンドポイント':<30}{'cold peak':>11}{'上限':>8}{'retained':>10}{'warm peak':>11}{'retained':>10}  (MB)")
+        results = run_corpus(name, n_groups, statements_per_group)
+        for path, r in results.items():
+            peak_limit = PEAK_LIMITS_MB[name][path]
+            problems = []
+            if r['cold_peak_mb'] > peak_limit:
+                problems.append(f"peak {r['cold_peak_mb']} MB > {peak_limit} MB")
+            if r['cold_retained_mb'] > RETAINED_LIMITS_MB[name]:
+                problems.append(f"retained {r['cold_retained_mb']} MB > {RETAINED_LIMITS_MB[name]} MB")
+            print(f"{path:<30}{r['cold_peak_mb']:11.2f}{peak_limit:8.1f}{r['cold_retained_mb']:10.2f}{r['warm_peak_mb']:11.2f}{r['warm_retained_mb']:10.2f}{'  <-- 上限超過' if problems else ''}")
+            failures.extend(f"{name} {path}: {problem}" for problem in problems)
+        all_results[name] = {'groups': n_groups, 'statements_per_group': statements_per_group,
+                             'peak_limits_mb': PEAK_LIMITS_MB[name], 'retained_limit_mb': RETAINED_LIMITS_MB[name],
+                             'endpoints': results}
+    tracemalloc.stop()
+
+    with open(MEMORY_BENCHMARK_RESULTS_PATH, 'w', encoding='utf-8') as f:
+        json.dump(all_results, f, ensure_ascii=False, indent=2)
+    print(f"\n結果を {MEMORY_BENCHMARK_RESULTS_PATH} に保存しました。")
+
+    if failures:
+        print("\nメモリ使用量が上限を超えました:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("すべてのエンドポイントが上限内です。")
+
+
+if __name__ == '__main__':
+    main()
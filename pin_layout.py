@@ -0,0 +1,71 @@
+import math
+
+# --- 地図上で重なるピンの表示位置の計算 ---
+# 同じ位置（または DUPLICATE_RADIUS_METERS 以内）にある整備名グループのピンを、最初のピンを中心にした輪の上に並べる。
+# 近くのピンは、緯度経度をメートル単位の格子に区切った辞書（グリッドハッシュ）で周囲9マスだけを探す。
+# グループを決まった順番（整備名順）で渡せば、何度計算しても同じ表示位置になる。
+DUPLICATE_RADIUS_METERS = 5.0 # この距離以内のピンは重なっているとみなす
+RING_SPACING_METERS = 15.0 # 中心から1周目までの距離（n周目は n 倍）
+FIRST_RING_SLOTS = 6 # 1周目に置けるピンの数（n周目は n 倍）
+METERS_PER_DEGREE = 111320.0 # 緯度1度あたりのおおよその距離
+# ----------------------------------------
+
+
+def ring_slot_offset(slot):
+    """slot番目（1始まり）の重なったピンを置く位置を、中心からの (北向きm, 東向きm) で返す関数"""
+    ring = 1
+    while slot > FIRST_RING_SLOTS * ring:
+        slot -= FIRST_RING_SLOTS * ring
+        ring += 1
+    slots_in_ring = FIRST_RING_SLOTS * ring
+    # 偶数周目は半分ずらして、内側の輪のピンと同じ方向に並ばないようにする
+    angle = 2 * math.pi * (slot - 1) / slots_in_ring + (math.pi / slots_in_ring if ring % 2 == 0 else 0)
+    radius = RING_SPACING_METERS * ring
+    return radius * math.cos(angle), radius * math.sin(angle)
+
+
+class PinLayout:
+    """ピンを1つずつ受け取り、重なるものを輪の上にずらした表示位置を返すクラス"""
+
+    def __init__(self, radius_meters=DUPLICATE_RADIUS_METERS):
+        self.radius_meters = radius_meters
+        self._cells = {} # (x方向の格子番号, y方向の格子番号) -> その格子にある中心ピンのリスト
+        self._lon_scale = None # 経度1度あたりの距離（最初のピンの緯度で固定し、格子の位置がずれないようにする）
+
+    def _to_meters(self, lat, lon):
+        return lon * self._lon_scale, lat * METERS_PER_DEGREE
+
+    def _cell(self, x, y):
+        return math.floor(x / self.radius_meters), math.floor(y / self.radius_meters)
+
+    def _find_anchor(self, x, y):
+        cell_x, cell_y = self._cell(x, y)
+        nearest = None
+        nearest_distance = None
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for anchor in self._cells.get((cell_x + dx, cell_y + dy), []):
+                    distance = math.hypot(anchor['x'] - x, anchor['y'] - y)
+                    if distance <= self.radius_meters and (nearest is None or distance < nearest_distance):
+                        nearest, nearest_distance = anchor, distance
+        return nearest
+
+    def place(self, lat, lon):
+        """ピンの本来の位置 (lat, lon) を受け取り、表示位置 (lat, lon) を返す。位置がなければ (None, None)"""
+        if lat is None or lon is None:
+            return None, None
+        if self._lon_scale is None:
+            self._lon_scale = METERS_PER_DEGREE * math.cos(math.radians(lat))
+
+        x, y = self._to_meters(lat, lon)
+        anchor = self._find_anchor(x, y)
+        if anchor is None:
+            # 近くにピンがなければ、本来の位置にそのまま置いて新しい中心にする
+            anchor = {'lat': lat, 'lon': lon, 'x': x, 'y': y, 'members': 0}
+            self._cells.setdefault(self._cell(x, y), []).append(anchor)
+            return lat, lon
+
+        anchor['members'] += 1
+        north, east = ring_slot_offset(anchor['members'])
+        return (round(anchor['lat'] + north / METERS_PER_DEGREE, 7),
+                round(anchor['lon'] + east / self._lon_scale, 7))
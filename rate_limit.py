@@ -0,0 +1,53 @@
+import math
+import threading
+import time
+
+# --- クライアントごとのリクエスト数制限（トークンバケット） ---
+# キー（クライアントIPとエンドポイント）ごとに最大 capacity 個のトークンを持ち、1秒あたり rate 個ずつ補充する。
+# 1リクエストごとに1個使い、足りなければ拒否して、次のトークンが貯まるまでの秒数を返す。
+# バケットの保存先（バックエンド）は take(key, rate, capacity, now) を持つオブジェクトなら差し替えられる。
+# MemoryBucketBackend はワーカープロセスごとのメモリに持つので、実際の上限は「ワーカー数 x 設定値」になる。
+# 全ワーカーで共有したい場合は、同じ take() を共有ストア（Redisなど）で実装したバックエンドを渡す。
+# -----------------------------------------------------------------
+
+
+class MemoryBucketBackend:
+    """トークンバケットをプロセス内の辞書に保存するバックエンド"""
+
+    PRUNE_INTERVAL = 1000 # この回数ごとに、満タンに戻ったバケットを捨てる（辞書がクライアント数だけ増え続けないように）
+
+    def __init__(self):
+        self._buckets = {} # キー -> (残りトークン数, 最後に更新した時刻)
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def take(self, key, rate, capacity, now):
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                allowed, retry_after = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (1 - tokens) / rate
+
+            self._calls += 1
+            if self._calls % self.PRUNE_INTERVAL == 0:
+                full_after = capacity / rate
+                self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < full_after}
+            return allowed, retry_after
+
+
+class TokenBucketLimiter:
+    def __init__(self, rate_per_minute, burst, backend=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst
+        self.backend = backend if backend is not None else MemoryBucketBackend()
+
+    def allow(self, key):
+        """(許可するか, 再試行までの秒数) を返す"""
+        allowed, retry_after = self.backend.take(key, self.rate, self.capacity, time.monotonic())
+        if allowed:
+            return True, 0
+        return False, max(1, math.ceil(retry_after))
@@ -0,0 +1,252 @@
+import copy
+import datetime
+import itertools
+import os
+import random
+import threading
+import time
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+
+# --- 負荷試験・ベンチマーク用の代替データソース ---
+# app.py を CASES_DATA_SOURCE=standin で起動すると、Firestoreの代わりにこのモジュールの
+# 合成データを使う。app.py が使うFirestoreクライアントのメソッドだけを同じ形で用意している。
+STANDIN_GROUPS = int(os.environ.get('STANDIN_GROUPS', 100)) # 整備名グループの数
+STANDIN_STATEMENTS_PER_GROUP = int(os.environ.get('STANDIN_STATEMENTS_PER_GROUP', 4)) # 1グループあたりの発言数
+STANDIN_LATENCY_MS = float(os.environ.get('STANDIN_LATENCY_MS', 50)) # Firestoreへの1回の読み書きを模した待ち時間
+STANDIN_SEED = int(os.environ.get('STANDIN_SEED', 0))
+# -------------------------------------------------
+
+CATEGORY_PREFIXES = ['R', 'C', 'K', 'D', 'O']
+VOCABULARY = {
+    '整備': ['階段', '手すり', 'ベンチ', '花壇', '手すり,階段', '舗装', '不明'],
+    '目的': ['安全', '休憩', '景観', '通行', '安全,通行', '不明'],
+    '発意': ['個人', '自治会', '行政', '個人,自治会', '不明'],
+    '実行': ['個人', '自治会', '業者', '行政'],
+    '費用': ['個人負担', '自治会費', '市', '不明'],
+    '契機': ['転倒', '高齢化', '災害', '要望', '不明'],
+    '時期': ['戦前', '昭和40年代', '昭和50年代', '平成初期', '10年前', '20年前', '最近', '不明'],
+    '所有': ['公道', '私有地', '里道', '不明'],
+    '管理': ['個人', '自治会', '市', '不明'],
+    '利用': ['住民', '通学', '観光', '不明'],
+}
+STATEMENT_FRAGMENTS = [
+    '昔はこの坂を毎日上り下りしよった', '手すりがないと年寄りは危ないけえ', '自治会でお金を出し合うて作った',
+    '雨が降ると階段が滑るんよ', '市に頼んでもなかなかやってくれんかった', '子どもらの通学路じゃけえね',
+    '花を植えたら近所の人が手入れしてくれるようになった', '災害の後にみんなで直した',
+]
+
+
+def generate_synthetic_cases(n_groups=STANDIN_GROUPS, statements_per_group=STANDIN_STATEMENTS_PER_GROUP, seed=STANDIN_SEED):
+    """Firestoreの 'cases' コレクションと同じ形の合成データ {ドキュメントID: dict} を作る関数"""
+    rnd = random.Random(seed)
+    date_added = datetime.datetime(2025, 7, 21, 7, 57, 39, tzinfo=datetime.timezone.utc)
+    docs = {}
+    for g in range(n_groups):
+        prefix = CATEGORY_PREFIXES[g % len(CATEGORY_PREFIXES)]
+        group_name = f'{prefix}{g:04d} {rnd.choice(VOCABULARY["整備"][:-1])}の整備'
+        has_coords = rnd.random() < 0.8
+        lat = round(34.235 + rnd.random() * 0.01, 6)
+        lon = round(132.545 + rnd.random() * 0.01, 6)
+        photo = f'{prefix.lower()}{g:02d}_photo1.jpg' if rnd.random() < 0.3 else None
+        for k in range(statements_per_group):
+            doc = {
+                '整備名': group_name,
+                '発言者': f'話者{rnd.randrange(40)}さん',
+                '発言内容': f'{rnd.choice(STATEMENT_FRAGMENTS)}。{rnd.choice(STATEMENT_FRAGMENTS)}（{g}-{k}）',
+                '緯度': lat if has_coords and k == 0 else None,
+                '経度': lon if has_coords and k == 0 else None,
+                '写真': photo if k == 0 else None,
+                'date_added': date_added,
+            }
+            for col, values in VOCABULARY.items():
+                doc[col] = rnd.choice(values) if rnd.random() < 0.7 else None
+            docs[f'{prefix}-{g:04d}-{k:02d}'] = doc
+    return docs
+
+
+_MISSING = object()
+
+
+def _field_value(data, field_path):
+    """Firestoreと同じ規則でフィールドパスを解釈して値を返す（英数字以外の名前はバッククォートが必要。違反はValueError）"""
+    value = data
+    for part in FieldPath.from_api_repr(field_path).parts:
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _resolve_server_timestamps(data):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return {key: (now if value is firestore.SERVER_TIMESTAMP else value) for key, value in data.items()}
+
+
+class StandInDocument:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+    def get(self, field):
+        value = _field_value(self._data, field)
+        if value is _MISSING:
+            raise KeyError(field) # Firestoreの DocumentSnapshot.get() も存在しないフィールドはKeyError
+        return value
+
+
+class StandInDocumentReference:
+    def __init__(self, client, collection_name, doc_id):
+        self._client = client
+        self._collection_name = collection_name
+        self.id = doc_id
+
+    def _docs(self):
+        return self._client._collections.setdefault(self._collection_name, {})
+
+    def get(self):
+        self._client._wait()
+        with self._client._lock:
+            return StandInDocument(self.id, copy.deepcopy(self._docs().get(self.id)))
+
+    def set(self, data):
+        self._client._wait()
+        with self._client._lock:
+            self._docs()[self.id] = _resolve_server_timestamps(data)
+
+    def update(self, data):
+        self._client._wait()
+        with self._client._lock:
+            if self.id not in self._docs():
+                raise KeyError(f'No document to update: {self._collection_name}/{self.id}')
+            self._docs()[self.id].update(_resolve_server_timestamps(data))
+
+    def delete(self):
+        self._client._wait()
+        with self._client._lock:
+            self._docs().pop(self.id, None)
+
+
+_FILTER_OPERATORS = {
+    '<': lambda a, b: a < b, '<=': lambda a, b: a <= b, '==': lambda a, b: a == b,
+    '>': lambda a, b: a > b, '>=': lambda a, b: a >= b, '!=': lambda a, b: a != b,
+}
+
+
+class StandInCollection:
+    def __init__(self, client, name, order_field=None, filters=(), limit_count=None):
+        self._client = client
+        self._name = name
+        self._order_field = order_field
+        self._filters = filters # (フィールドパス, 演算子, 値) のタプル
+        self._limit_count = limit_count
+
+    def _query(self, **changes):
+        query = dict(order_field=self._order_field, filters=self._filters, limit_count=self._limit_count)
+        query.update(changes)
+        return StandInCollection(self._client, self._name, **query)
+
+    def document(self, doc_id=None):
+        if doc_id is None:
+            doc_id = f'auto{next(self._client._auto_ids)}'
+        return StandInDocumentReference(self._client, self._name, doc_id)
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return None, ref
+
+    def order_by(self, field):
+        FieldPath.from_api_repr(field) # Firestoreと同じく、クエリを作る時点でフィールドパスを検証する
+        return self._query(order_field=field)
+
+    def where(self, filter):
+        FieldPath.from_api_repr(filter.field_path)
+        if filter.op_string not in _FILTER_OPERATORS:
+            raise ValueError(f'Unsupported operator in stand-in query: {filter.op_string}')
+        return self._query(filters=self._filters + ((filter.field_path, filter.op_string, filter.value),))
+
+    def limit(self, count):
+        return self._query(limit_count=count)
+
+    def stream(self):
+        self._client._wait()
+        with self._client._lock:
+            items = [(doc_id, copy.deepcopy(data)) for doc_id, data in self._client._collections.get(self._name, {}).items()]
+        for field_path, op_string, value in self._filters:
+            # Firestoreと同じく、比較するフィールドがない（またはnullの）ドキュメントは条件に一致しない
+            items = [(doc_id, data) for doc_id, data in items
+                     if _field_value(data, field_path) not in (_MISSING, None)
+                     and _FILTER_OPERATORS[op_string](_field_value(data, field_path), value)]
+        if self._order_field is not None:
+            # Firestoreと同じく、並べ替えるフィールドがないドキュメントは返さない（値がnullのものは先頭に並ぶ）
+            values = {doc_id: _field_value(data, self._order_field) for doc_id, data in items}
+            items = sorted((item for item in items if values[item[0]] is not _MISSING),
+                           key=lambda item: (values[item[0]] is not None, values[item[0]] if values[item[0]] is not None else ''))
+        if self._limit_count is not None:
+            items = items[:self._limit_count]
+        for doc_id, data in items:
+            yield StandInDocument(doc_id, data)
+
+
+class StandInWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._operations = []
+
+    def set(self, ref, data):
+        self._operations.append((ref, 'set', data))
+
+    def update(self, ref, data):
+        self._operations.append((ref, 'update', data))
+
+    def delete(self, ref):
+        self._operations.append((ref, 'delete', None))
+
+    def commit(self):
+        self._client._wait()
+        with self._client._lock:
+            for ref, op, data in self._operations:
+                docs = ref._docs()
+                if op == 'set':
+                    docs[ref.id] = _resolve_server_timestamps(data)
+                elif op == 'update':
+                    if ref.id not in docs:
+                        raise KeyError(f'No document to update: {ref._collection_name}/{ref.id}')
+                    docs[ref.id].update(_resolve_server_timestamps(data))
+                else:
+                    docs.pop(ref.id, None)
+
+
+class StandInFirestore:
+    """app.py が使う範囲のFirestoreクライアントを、メモリ上のデータと一定の待ち時間で模したクラス"""
+
+    def __init__(self, cases, latency_ms=STANDIN_LATENCY_MS):
+        self._collections = {'cases': cases}
+        self._latency_seconds = latency_ms / 1000.0
+        self._lock = threading.Lock()
+        self._auto_ids = itertools.count()
+
+    @classmethod
+    def from_env(cls):
+        return cls(generate_synthetic_cases())
+
+    def _wait(self):
+        if self._latency_seconds > 0:
+            time.sleep(self._latency_seconds)
+
+    def collection(self, name):
+        return StandInCollection(self, name)
+
+    def batch(self):
+        return StandInWriteBatch(self)
+
+    def get_all(self, refs):
+        self._wait()
+        with self._lock:
+            return [StandInDocument(ref.id, copy.deepcopy(ref._docs().get(ref.id))) for ref in refs]
@@ -34,11 +34,8 @@ document.addEventListener('DOMContentLoaded', () => {
     // 既存事例を読み込み、リストに表示
     async function loadAdminCases() {
         try {
-            const response = await fetch('/api/cases'); 
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
-            }
-            const cases = await response.json();
+            // 前回から変更された事例のみ取得 (case_sync.js)
+            const cases = await loadCasesWithSync();
 
             caseListAdmin.innerHTML = ''; 
             for (const id in currentMarkers) {
@@ -196,6 +193,39 @@ document.addEventListener('DOMContentLoaded', () => {
         }, 5000); 
     }
 
+    // ★新規追加: 一括更新（/api/cases/batch に1回で送信し、一覧の再読み込みも1回だけ行う）
+    document.getElementById('batchSubmitButton').addEventListener('click', async () => {
+        let payload;
+        try {
+            payload = JSON.parse(document.getElementById('batchInput').value);
+        } catch (error) {
+            showMessage('error', `JSONの形式が正しくありません: ${error.message}`);
+            return;
+        }
+        if (Array.isArray(payload)) {
+            payload = { upserts: payload, deletes: [] }; // 配列の場合はすべて追加・更新として扱う
+        }
+
+        try {
+            const response = await fetch('/api/cases/batch', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(payload)
+            });
+            const result = await response.json();
+
+            const failed = (result.results || []).filter(item => !item.success);
+            failed.forEach(item => console.warn(`一括更新に失敗: ${item.op} ${item.事例}: ${item.message}`));
+            showMessage(result.success ? 'success' : 'error', result.message || '一括更新中にエラーが発生しました。');
+            if (result.results && result.results.length > failed.length) {
+                loadAdminCases();
+            }
+        } catch (error) {
+            console.error('一括更新中にエラーが発生しました:', error);
+            showMessage('error', '一括更新中にネットワークエラーが発生しました。');
+        }
+    });
+
     async function confirmDelete(caseId, caseName) {
         if (confirm(`本当に事例 ${caseName} (${caseId}) を削除しますか？`)) {
             try {
@@ -0,0 +1,73 @@
+// /api/cases/changes を使った差分同期
+// 前回受け取った事例データとバージョンをlocalStorageに保存し、2回目以降は変更された事例だけを取得する
+const CASE_SYNC_STORAGE_KEY = 'ryojo_cases_sync';
+
+function readCachedCases() {
+    try {
+        const cached = JSON.parse(localStorage.getItem(CASE_SYNC_STORAGE_KEY));
+        if (cached && typeof cached.version === 'number' && Array.isArray(cached.cases)) {
+            return cached;
+        }
+    } catch (error) {
+        console.warn('保存済みの事例データを読み込めませんでした:', error);
+    }
+    return null;
+}
+
+// 保存済みの事例データがあるかどうか（地図ページで差分同期とストリーミングを切り替えるために使う）
+function hasCachedCases() {
+    return readCachedCases() !== null;
+}
+
+// 事例データとバージョンを保存する（地図ページのNDJSON読み込みの後にも呼び出し、次回から差分同期にする）
+function saveCachedCases(version, cases) {
+    try {
+        localStorage.setItem(CASE_SYNC_STORAGE_KEY, JSON.stringify({ version: version, cases: cases }));
+    } catch (error) {
+        console.warn('事例データをlocalStorageに保存できませんでした:', error);
+    }
+}
+
+// 最新の事例一覧（/api/cases と同じ形式の配列）を返す
+async function loadCasesWithSync() {
+    const cached = readCachedCases();
+    const since = cached ? cached.version : 0;
+
+    const response = await fetch(`/api/cases/changes?since=${since}`);
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const changes = await response.json();
+    console.log(`DEBUG (case_sync.js): バージョン ${since} からの変更: 追加・更新 ${changes.upserted.length} 件, 削除 ${changes.deleted.length} 件`);
+
+    let cases;
+    if (changes.full || !cached) {
+        cases = changes.upserted;
+    } else {
+        const casesById = new Map(cached.cases.map(caseItem => [caseItem.id, caseItem]));
+        changes.deleted.forEach(id => casesById.delete(id));
+        changes.upserted.forEach(caseItem => casesById.set(caseItem.id, caseItem));
+        // 変更ログに残らない削除（initialize_db.py やFirebaseコンソールでの操作）に備えて、サーバーにない事例も取り除く
+        if (Array.isArray(changes.group_ids)) {
+            const groupIds = new Set(changes.group_ids);
+            Array.from(casesById.keys()).forEach(id => {
+                if (!groupIds.has(id)) {
+                    casesById.delete(id);
+                }
+            });
+        }
+        // サーバーと同じく整備名（id）順に並べる
+        cases = Array.from(casesById.values()).sort((a, b) => (a.id < b.id ? -1 : a.id > b.id ? 1 : 0));
+    }
+
+    // 重なるピンの表示位置は他のグループの変更でも動くので、毎回サーバーの結果をすべての事例に反映する
+    const displayPositions = changes.display_positions || {};
+    cases.forEach(caseItem => {
+        const position = displayPositions[caseItem.id];
+        caseItem.display_latitude = position ? position[0] : caseItem.latitude;
+        caseItem.display_longitude = position ? position[1] : caseItem.longitude;
+    });
+
+    saveCachedCases(changes.version, cases);
+    return cases;
+}
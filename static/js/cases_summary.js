@@ -12,13 +12,15 @@ document.addEventListener('DOMContentLoaded', async () => {
 
     const summaryCaseGridDiv = document.getElementById('summary-case-grid'); 
 
+    // サーバーサイドレンダリング済みの場合は、ボタンの設定だけを行う
+    if (summaryCaseGridDiv.dataset.ssr === 'true') {
+        summaryCaseGridDiv.querySelectorAll('.summary-item').forEach(setupStatementsToggle);
+        return;
+    }
+
     try {
-        // Fetch all case data from the Flask API
-        const response = await fetch('/api/cases'); 
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        const allCases = await response.json(); 
+        // Fetch all case data from the Flask API (前回から変更された事例のみ取得: case_sync.js)
+        const allCases = await loadCasesWithSync(); 
 
         console.log("DEBUG (cases_summary.js): APIから取得した全事例:", allCases);
         allCases.forEach(c => console.log(`  事例ID: ${c.id}, カテゴリ(フィルタ用): ${c.category}, カテゴリ(表示用): ${c.display_category_jp}`));
@@ -72,26 +74,29 @@ document.addEventListener('DOMContentLoaded', async () => {
                 <p><strong>カテゴリ:</strong> ${caseItem.display_category_jp || caseItem.category || '不明'}</p> 
             `;
             summaryCaseGridDiv.appendChild(caseDiv);
-
-            // ヒアリング内容表示/非表示ボタンのイベントリスナーを設定
-            const toggleButton = caseDiv.querySelector('.toggle-statements-btn');
-            const statementsContent = caseDiv.querySelector('.statements-content');
-
-            if (toggleButton && statementsContent) {
-                toggleButton.addEventListener('click', () => {
-                    if (statementsContent.style.display === 'none') {
-                        statementsContent.style.display = 'block';
-                        toggleButton.textContent = 'ヒアリング内容を非表示';
-                    } else {
-                        statementsContent.style.display = 'none';
-                        toggleButton.textContent = 'ヒアリング内容を表示';
-                    }
-                });
-            }
+            setupStatementsToggle(caseDiv);
         });
 
     } catch (error) {
         console.error('事例データの読み込み中にエラーが発生しました:', error);
         summaryCaseGridDiv.innerHTML = `<p>事例データの読み込みに失敗しました。エラー: ${error.message}</p>`;
     }
+
+    // ヒアリング内容表示/非表示ボタンのイベントリスナーを設定
+    function setupStatementsToggle(caseDiv) {
+        const toggleButton = caseDiv.querySelector('.toggle-statements-btn');
+        const statementsContent = caseDiv.querySelector('.statements-content');
+
+        if (toggleButton && statementsContent) {
+            toggleButton.addEventListener('click', () => {
+                if (statementsContent.style.display === 'none') {
+                    statementsContent.style.display = 'block';
+                    toggleButton.textContent = 'ヒアリング内容を非表示';
+                } else {
+                    statementsContent.style.display = 'none';
+                    toggleButton.textContent = 'ヒアリング内容を表示';
+                }
+            });
+        }
+    }
 });
@@ -2,6 +2,12 @@ document.addEventListener('DOMContentLoaded', async () => {
     const customizeCaseGridDiv = document.getElementById('customize-case-grid');
     const historicalTimelineContainer = document.getElementById('historical-timeline-container'); // 年表コンテナ
 
+    // サーバーサイドレンダリング済みの場合は、ボタンの設定だけを行う
+    if (customizeCaseGridDiv.dataset.ssr === 'true') {
+        setupStatementsToggles();
+        return;
+    }
+
     try {
         // ★新規追加: 歴史年表データを取得し描画
         await loadHistoricalSummary();
@@ -94,7 +100,16 @@ document.addEventListener('DOMContentLoaded', async () => {
             customizeCaseGridDiv.appendChild(groupSection); // メインのコンテナにグループセクションを追加
         });
 
-        // ヒアリング内容表示/非表示ボタンのイベントリスナーを再設定
+        setupStatementsToggles();
+
+
+    } catch (error) {
+        console.error('カスタマイズ事例データの読み込み中にエラーが発生しました:', error);
+        customizeCaseGridDiv.innerHTML = `<p>カスタマイズ事例データの読み込みに失敗しました。エラー: ${error.message}</p>`;
+    }
+
+    // ヒアリング内容表示/非表示ボタンのイベントリスナーを設定
+    function setupStatementsToggles() {
         customizeCaseGridDiv.querySelectorAll('.toggle-statements-btn').forEach(toggleButton => {
             const statementsContent = toggleButton.nextElementSibling; // ボタンの次の要素が内容
             if (toggleButton && statementsContent) {
@@ -109,11 +124,6 @@ document.addEventListener('DOMContentLoaded', async () => {
                 });
             }
         });
-
-
-    } catch (error) {
-        console.error('カスタマイズ事例データの読み込み中にエラーが発生しました:', error);
-        customizeCaseGridDiv.innerHTML = `<p>カスタマイズ事例データの読み込みに失敗しました。エラー: ${error.message}</p>`;
     }
 
     // ★新規追加: 歴史年表データを読み込み、表示する関数
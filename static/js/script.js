@@ -84,107 +84,157 @@ map.on('load', async () => {
 });
 
 // データベースから事例データを取得し、地図とサイドバーに表示する関数
+// 保存済みの事例データがあれば差分だけを取得し (case_sync.js)、
+// なければ /api/cases?format=ndjson で1行1事例ずつ受け取り、届いた事例から順に表示する
+// NDJSONの最後の行 {"sync_version": ...} を受け取ったら、事例データと一緒に保存して次回から差分同期にする
 async function loadCases() {
     try {
         console.log('APIからデータを取得しようとしています...'); 
-        const response = await fetch('/api/cases'); 
+        if (hasCachedCases()) {
+            await loadCachedCases();
+            return;
+        }
+        const response = await fetch('/api/cases?format=ndjson'); 
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
-        const cases = await response.json(); 
-        console.log('取得したデータ (グループ化後):', cases); 
 
         const caseListDiv = document.getElementById('case-list'); 
         if (!caseListDiv) {
             console.error("エラー: ID 'case-list' の要素が見つかりません。index.html を確認してください。");
             return; 
         }
-        caseListDiv.innerHTML = ''; 
 
-        if (cases.length === 0) {
+        let caseCount = 0;
+        const streamedCases = [];
+        let syncVersion = null;
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            if (value) {
+                buffer += decoder.decode(value, { stream: true });
+            }
+            if (done) {
+                buffer += decoder.decode();
+            }
+            const lines = buffer.split('\n');
+            buffer = done ? '' : lines.pop(); // 最後の行は途中かもしれないので次に回す
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const item = JSON.parse(line);
+                if ('sync_version' in item) {
+                    syncVersion = item.sync_version;
+                    continue;
+                }
+                if (caseCount === 0) {
+                    caseListDiv.innerHTML = ''; // 最初の事例が届いたら「読み込み中」を消す
+                }
+                renderCase(item, caseListDiv);
+                streamedCases.push(item);
+                caseCount++;
+            }
+            if (done) break;
+        }
+        console.log('取得した事例数 (グループ化後):', caseCount); 
+        if (typeof syncVersion === 'number') {
+            saveCachedCases(syncVersion, streamedCases);
+        }
+
+        if (caseCount === 0) {
             caseListDiv.innerHTML = '<p>表示する事例がありません。</p>';
-            return;
         }
 
-        // ★修正: 重複座標を追跡するためのMapをループの外で初期化
-        const placedCoordinates = new Map(); // Map<"lat,lon", count>
+    } catch (error) {
+        console.error('データの読み込み中にエラーが発生しました:', error);
+        document.getElementById('case-list').innerHTML = '<p>データの読み込みに失敗しました。サーバーが起動しているか確認してください。</p>';
+    }
+}
 
-        cases.forEach(point => {
-            let lat = point.latitude;
-            let lon = point.longitude;
-            const hasValidCoords = typeof lat === 'number' && !isNaN(lat) && typeof lon === 'number' && !isNaN(lon);
+// 差分同期した事例データをまとめて表示する関数
+async function loadCachedCases() {
+    const cases = await loadCasesWithSync();
+    console.log('取得したデータ (グループ化後):', cases); 
 
-            if (hasValidCoords) {
-                const coordKey = `${lat.toFixed(6)},${lon.toFixed(6)}`; // 緯度経度を文字列キーに変換
-                let offsetCount = placedCoordinates.get(coordKey) || 0;
+    const caseListDiv = document.getElementById('case-list'); 
+    if (!caseListDiv) {
+        console.error("エラー: ID 'case-list' の要素が見つかりません。index.html を確認してください。");
+        return; 
+    }
+    caseListDiv.innerHTML = ''; 
 
-                if (offsetCount > 0) {
-                    // ★修正: シンプルな線形オフセットを適用 (右にずらす)
-                    const offsetAmount = 0.0001; // オフセット量 (度数)。小さい値で試す
-                    lon += offsetAmount * offsetCount; // 経度を増やすことで右にずれる
-                    console.log(`DEBUG: Applying offset to ${point.name}. Original: ${point.longitude}, New: ${lon.toFixed(6)}`);
-                }
-                placedCoordinates.set(coordKey, offsetCount + 1); // カウントを増やす
+    if (cases.length === 0) {
+        caseListDiv.innerHTML = '<p>表示する事例がありません。</p>';
+        return;
+    }
 
-                const markerColor = point.is_area_wide ? '#FFD700' : '#007cbf'; 
+    cases.forEach(point => renderCase(point, caseListDiv));
+}
 
-                const el = document.createElement('div');
-                el.className = 'custom-marker';
-                if (point.is_area_wide) {
-                    el.classList.add('area-wide'); 
-                }
-                el.style.backgroundColor = markerColor; 
-                
-                el.textContent = point.name || `事例 ${point.id}`; 
-
-                marker = new mapboxgl.Marker(el)
-                    .setLngLat([lon, lat]) 
-                    .addTo(map);
-            } else {
-                console.warn(`事例 ${point.id} (${point.name}) に有効な緯度・経度がありません。地図上にマーカーは表示されません。`);
-            }
+// 事例1件分のマーカー・ポップアップ・サイドバー項目を追加する関数
+function renderCase(point, caseListDiv) {
+    // ★修正: 重なるピンはサーバー側でずらしてあるので、表示位置 (display_latitude/display_longitude) にそのまま置く
+    const lat = point.display_latitude ?? point.latitude;
+    const lon = point.display_longitude ?? point.longitude;
+    let marker = null;
+    const hasValidCoords = typeof lat === 'number' && !isNaN(lat) && typeof lon === 'number' && !isNaN(lon);
 
-            // ポップアップの内容を作成
-            let popupContent = `<h3>${point.name || '名称不明'}</h3>`; 
-            if (point.image_url) { 
-                popupContent += `<img src="/static/images/${point.image_url}" alt="事例 ${point.id || ''}" style="max-width:100%; margin-bottom: 10px;">`;
-            }
-            popupContent += point.description; 
+    if (hasValidCoords) {
+        const markerColor = point.is_area_wide ? '#FFD700' : '#007cbf'; 
 
-            const popup = new mapboxgl.Popup({ offset: 25 })
-                .setHTML(popupContent);
-            
-            if (marker) {
-                marker.setPopup(popup);
-            }
+        const el = document.createElement('div');
+        el.className = 'custom-marker';
+        if (point.is_area_wide) {
+            el.classList.add('area-wide'); 
+        }
+        el.style.backgroundColor = markerColor; 
+        
+        el.textContent = point.name || `事例 ${point.id}`; 
 
-            // サイドバーに事例リスト項目を追加
-            const caseItem = document.createElement('div');
-            caseItem.className = 'case-item';
-            caseItem.innerHTML = `
-                <h3>${point.name || '名称不明'}</h3> 
-                ${point.image_url ? `<img src="/static/images/${point.image_url}" alt="事例 ${point.id || ''}">` : ''} 
-                ${point.description} 
-            `;
-            caseItem.onclick = () => {
-                const originalLat = point.latitude;
-                const originalLon = point.longitude;
-                if (typeof originalLat === 'number' && !isNaN(originalLat) && typeof originalLon === 'number' && !isNaN(originalLon)) {
-                    map.flyTo({ center: [originalLon, originalLat], zoom: 15, pitch: 45 });
-                    if (marker) { 
-                        marker.getPopup().addTo(map);
-                    }
-                } else {
-                    showMessage('info', `事例 ${point.name} には地図上の位置情報がありません。`);
-                }
-            };
-            caseListDiv.appendChild(caseItem);
-        });
+        marker = new mapboxgl.Marker(el)
+            .setLngLat([lon, lat]) 
+            .addTo(map);
+    } else {
+        console.warn(`事例 ${point.id} (${point.name}) に有効な緯度・経度がありません。地図上にマーカーは表示されません。`);
+    }
 
-    } catch (error) {
-        console.error('データの読み込み中にエラーが発生しました:', error);
-        document.getElementById('case-list').innerHTML = '<p>データの読み込みに失敗しました。サーバーが起動しているか確認してください。</p>';
+    // ポップアップの内容を作成
+    let popupContent = `<h3>${point.name || '名称不明'}</h3>`; 
+    if (point.image_url) { 
+        popupContent += `<img src="/static/images/${point.image_url}" alt="事例 ${point.id || ''}" style="max-width:100%; margin-bottom: 10px;">`;
     }
+    popupContent += point.description; 
+
+    const popup = new mapboxgl.Popup({ offset: 25 })
+        .setHTML(popupContent);
+    
+    if (marker) {
+        marker.setPopup(popup);
+    }
+
+    // サイドバーに事例リスト項目を追加
+    const caseItem = document.createElement('div');
+    caseItem.className = 'case-item';
+    caseItem.innerHTML = `
+        <h3>${point.name || '名称不明'}</h3> 
+        ${point.image_url ? `<img src="/static/images/${point.image_url}" alt="事例 ${point.id || ''}">` : ''} 
+        ${point.description} 
+    `;
+    caseItem.onclick = () => {
+        const originalLat = point.latitude;
+        const originalLon = point.longitude;
+        if (typeof originalLat === 'number' && !isNaN(originalLat) && typeof originalLon === 'number' && !isNaN(originalLon)) {
+            map.flyTo({ center: [originalLon, originalLat], zoom: 15, pitch: 45 });
+            if (marker) { 
+                marker.getPopup().addTo(map);
+            }
+        } else {
+            showMessage('info', `事例 ${point.name} には地図上の位置情報がありません。`);
+        }
+    };
+    caseListDiv.appendChild(caseItem);
 }
 
 // メッセージ表示ヘルパー関数（script.jsにも追加）
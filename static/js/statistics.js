@@ -1,4 +1,9 @@
 document.addEventListener('DOMContentLoaded', async () => {
+    // サーバーサイドレンダリング済みの場合は、統計データを取得し直さない
+    if (document.querySelector('.chart-container[data-ssr="true"]')) {
+        return;
+    }
+
     try {
         // 統計データをAPIから取得 (app.pyでフィルタリング済み)
         const response = await fetch('/api/statistics');
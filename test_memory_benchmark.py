@@ -0,0 +1,31 @@
+import tracemalloc
+
+import pytest
+
+import memory_benchmark
+
+# memory_benchmark.py の small コーパスで、エンドポイントごとの cold の peak / retained が上限を超えていないかを確かめるテスト。
+# 実行: python -m pytest -q test_memory_benchmark.py （medium / large は時間がかかるので python memory_benchmark.py で測る）
+CORPUS = 'small'
+
+
+@pytest.fixture(scope='module')
+def corpus_results():
+    n_groups, statements_per_group = memory_benchmark.CORPORA[CORPUS]
+    tracemalloc.start()
+    try:
+        yield memory_benchmark.run_corpus(CORPUS, n_groups, statements_per_group)
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize('path', memory_benchmark.ENDPOINTS)
+def test_cold_peak_within_limit(corpus_results, path):
+    peak_limit = memory_benchmark.PEAK_LIMITS_MB[CORPUS][path]
+    assert corpus_results[path]['cold_peak_mb'] <= peak_limit, f"{path}: peak {corpus_results[path]['cold_peak_mb']} MB > {peak_limit} MB"
+
+
+@pytest.mark.parametrize('path', memory_benchmark.ENDPOINTS)
+def test_cold_retained_within_limit(corpus_results, path):
+    retained_limit = memory_benchmark.RETAINED_LIMITS_MB[CORPUS]
+    assert corpus_results[path]['cold_retained_mb'] <= retained_limit, f"{path}: retained {corpus_results[path]['cold_retained_mb']} MB > {retained_limit} MB"